@@ -23,9 +23,10 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '$i(vzh5+hee&fg4yp@8nglgw%ksh1wz995xa0llelm8syb*9-o'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('ALLOWED_HOSTS', '').split(',')
+                 if host]
 
 
 # Application definition
@@ -39,19 +40,22 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'core',
+    'core.apps.CoreConfig',
     'user',
-    'recipe'
+    'recipe.apps.RecipeConfig',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -80,14 +84,49 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds a connection is kept open for later requests; 0 closes
+        # it after every request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Check a kept connection still works before each request uses it
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS',
+                                             '1') == '1',
+        # Share connections between threads through a pool of at most
+        # MAX_SIZE; 0 turns the pool off
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_SIZE', 0)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', 300)),
+        },
     }
 
     }
+
+# Read replicas of the default database, one per host in DB_REPLICA_HOSTS.
+# Reads go to a replica unless the client wrote within the last
+# REPLICA_PIN_SECONDS, so users always see their own changes
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        [host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+         if host], 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host,
+                            TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+# API token clients ignore the pin cookie, so their pins are kept in this
+# cache from CACHES. Every web process must see the same pins, so with
+# replicas configured it has to name a shared cache such as Redis,
+# memcached or the database; a per-process LocMemCache fails at startup.
+REPLICA_PIN_CACHE_ALIAS = os.environ.get('REPLICA_PIN_CACHE_ALIAS', 'default')
+
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -106,6 +145,30 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing: the policy picks the hasher for new and upgraded
+# passwords; older hashes are rehashed on the next successful login.
+# Argon2 costs follow the OWASP minimum (19 MiB, 2 passes, 1 lane)
+PASSWORD_HASHER_POLICY = os.environ.get('PASSWORD_HASHER_POLICY', 'argon2')
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 120000))
+
+PASSWORD_HASHER_POLICIES = {
+    'argon2': [
+        'core.hashers.TunedArgon2PasswordHasher',
+        'core.hashers.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+    'pbkdf2': [
+        'core.hashers.TunedPBKDF2PasswordHasher',
+        'core.hashers.TunedArgon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+}
+PASSWORD_HASHERS = PASSWORD_HASHER_POLICIES[PASSWORD_HASHER_POLICY]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
 
@@ -128,4 +191,85 @@ STATIC_ROOT = '/vol/web/static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+# Static files are served by WhiteNoise with precompressed copies made
+# by collectstatic
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
+
+# Uploaded file names are random, so browsers may cache them for good
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 31536000))
+# When set, media requests are handed to a front end proxy such as nginx
+# with X-Accel-Redirect to this internal location instead of being read
+# by Django
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
+
+AUTH_USER_MODEL = 'core.User'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Rendered recipe, tag and ingredient lists are cached under an ETag that
+# includes the user's collection version, so any backend is safe to use
+RECIPE_CACHE_ALIAS = os.environ.get('RECIPE_CACHE_ALIAS', 'default')
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
+# Build list responses straight from values() rows when the serializer
+# allows it, instead of serializing one model instance per row
+VALUES_LIST_RESPONSES = os.environ.get('VALUES_LIST_RESPONSES', '1') == '1'
+
+# Per endpoint request timings and query counts, served at /metrics in
+# the Prometheus text format. Off by default, which skips the middleware
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+# Scrapers send it as 'Authorization: Bearer <token>'. Without a token the
+# metrics are only served to clients on the same host
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Autocomplete answers kept in each process, keyed by user and prefix
+AUTOCOMPLETE_CACHE_SIZE = int(os.environ.get('AUTOCOMPLETE_CACHE_SIZE',
+                                             10000))
+
+# Background tasks run on worker threads in the web process; set
+# TASK_QUEUE_EAGER to run them inline instead (tests, one-off commands)
+TASK_QUEUE_WORKERS = int(os.environ.get('TASK_QUEUE_WORKERS', 2))
+TASK_QUEUE_EAGER = os.environ.get('TASK_QUEUE_EAGER', '') == '1'
+
+# Largest number of items accepted by a single bulk write request
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+
+# Rows read per database round trip when streaming a recipe export
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 500))
+
+# Rows written per transaction when importing recipes through the API
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.RecipeCursorPagination',
+    # Proxies in front of the app that append to X-Forwarded-For. With 0
+    # the client address comes from the connection, so clients cannot
+    # pick their own to get around the login throttle
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # Login attempts allowed per client address and per email address
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('LOGIN_IP_RATE', '30/min'),
+        'login_email': os.environ.get('LOGIN_EMAIL_RATE', '10/min'),
+    },
+}
+
+# Web server processes handling requests, which gunicorn.conf.py exports
+# for the workers it starts. Caches that revoke access have to be shared
+# once there is more than one.
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 1))
+
+# Validated API tokens are cached to skip the token lookup on each request.
+# Leave TOKEN_CACHE_ALIAS empty for a per-process LRU, or name a shared
+# cache from CACHES so that invalidation reaches every worker process.
+# With more than one of WEB_WORKERS a per-process cache fails at startup,
+# as a deleted token would keep working in the other workers.
+TOKEN_CACHE_ALIAS = os.environ.get('TOKEN_CACHE_ALIAS', '')
+TOKEN_CACHE_TIMEOUT = int(os.environ.get('TOKEN_CACHE_TIMEOUT', 300))
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', 10000))
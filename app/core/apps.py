@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core import signals  # noqa
+        from core.authentication import get_token_cache
+
+        # Fail at startup rather than on the first authenticated request
+        get_token_cache()
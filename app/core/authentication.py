@@ -0,0 +1,164 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.authentication import TokenAuthentication
+
+
+class LocalTokenCache:
+    """In-process LRU of validated tokens with a per-entry TTL"""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        """Return a counter that changes whenever an entry is deleted"""
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation):
+        """Store value unless an entry was deleted since generation"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class SharedTokenCache:
+    """Validated tokens kept in a Django cache shared between processes"""
+
+    generation_key = 'token-auth:generation'
+
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def generation(self):
+        """Return a counter that changes whenever an entry is deleted"""
+        return self.cache.get(self.generation_key, 0)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, generation):
+        """Store value unless an entry was deleted since generation"""
+        if generation == self.generation():
+            self.cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+        if not self.cache.add(self.generation_key, 1, None):
+            self.cache.incr(self.generation_key)
+
+    def clear(self):
+        """Empty the whole cache, including anything else kept in it"""
+        self.cache.clear()
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Return the token cache configured in settings
+
+    Raises ImproperlyConfigured when several web workers would each keep
+    their own copy, so a deleted token would still work in the others.
+    """
+    global _token_cache
+    if _token_cache is None:
+        alias = settings.TOKEN_CACHE_ALIAS
+        if settings.WEB_WORKERS > 1 and (not alias or isinstance(
+                caches[alias], (LocMemCache, DummyCache))):
+            raise ImproperlyConfigured(
+                f'TOKEN_CACHE_ALIAS has to name a cache shared between '
+                f'the {settings.WEB_WORKERS} WEB_WORKERS, or revoked '
+                f'tokens keep working in the workers that cached them'
+            )
+        timeout = settings.TOKEN_CACHE_TIMEOUT
+        if alias:
+            _token_cache = SharedTokenCache(alias, timeout)
+        else:
+            _token_cache = LocalTokenCache(
+                settings.TOKEN_CACHE_MAX_ENTRIES, timeout
+            )
+    return _token_cache
+
+
+def token_cache_key(key):
+    """Return the cache key for a token, without exposing the token"""
+    return 'token-auth:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    """Drop a token from the cache so its next use is checked again"""
+    get_token_cache().delete(token_cache_key(key))
+
+
+def _freeze(instance):
+    """Return the concrete field values of a model instance"""
+    return tuple(
+        getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    )
+
+
+def _thaw(model, values):
+    """Build a fresh model instance from frozen field values"""
+    field_names = [field.attname for field in model._meta.concrete_fields]
+    return model.from_db(None, field_names, values)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that skips the token lookup for cached keys"""
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cache_key = token_cache_key(key)
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            user = _thaw(get_user_model(), cached[0])
+            token = _thaw(self.get_model(), cached[1])
+            token.user = user
+            return (user, token)
+
+        generation = cache.generation()
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, (_freeze(user), _freeze(token)), generation)
+
+        return (user, token)
@@ -0,0 +1,89 @@
+import copy
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+
+# Database alias the benchmark threads connect through
+BENCHMARK_ALIAS = 'benchmark'
+
+
+def allowed_host():
+    """Return a host name the app accepts"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+class BenchmarkConnections:
+    """Database connections a benchmark opens apart from the caller's
+
+    While entered, BENCHMARK_ALIAS is registered with a copy of the
+    default database settings and the given overrides. Work started with
+    run() goes to new threads whose default connection is that alias, so
+    the connection and settings of the thread running the benchmark, such
+    as a test case's open transaction, are never closed or changed.
+    """
+
+    def __init__(self, **overrides):
+        default = connections[DEFAULT_DB_ALIAS]
+        self.vendor = default.vendor
+        self.settings_dict = copy.deepcopy(default.settings_dict)
+        self.settings_dict.update(overrides)
+        if self.vendor == 'postgresql':
+            # Also keeps a pool of the benchmark's connections apart
+            self.settings_dict['OPTIONS'] = dict(
+                self.settings_dict.get('OPTIONS') or {},
+                application_name=BENCHMARK_ALIAS
+            )
+
+    @property
+    def shared(self):
+        """Whether other threads can open the same database"""
+        name = str(self.settings_dict['NAME'])
+        return not (self.vendor == 'sqlite' and
+                    (name == ':memory:' or 'mode=memory' in name) and
+                    'cache=shared' not in name)
+
+    def __enter__(self):
+        connections.databases[BENCHMARK_ALIAS] = self.settings_dict
+        return self
+
+    def __exit__(self, *exc_info):
+        del connections.databases[BENCHMARK_ALIAS]
+        wrapper = load_backend(self.settings_dict['ENGINE']).DatabaseWrapper(
+            self.settings_dict, BENCHMARK_ALIAS
+        )
+        if getattr(wrapper, 'pool_options', None):
+            wrapper._pool(wrapper.get_connection_params()).close()
+
+    def run(self, work, counts):
+        """Call work(index, count) on one thread per count and wait
+
+        The first exception raised in a thread is raised again here, once
+        every thread has finished.
+        """
+        errors = []
+
+        def target(index, count):
+            connection = connections[BENCHMARK_ALIAS]
+            # Only this thread's default connection is replaced
+            setattr(connections._connections, DEFAULT_DB_ALIAS, connection)
+            try:
+                work(index, count)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=target, args=(index, count))
+                   for index, count in enumerate(counts)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if errors:
+            raise errors[0]
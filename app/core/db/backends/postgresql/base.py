@@ -0,0 +1,84 @@
+from django.db.backends.postgresql.base import \
+    DatabaseWrapper as PostgresDatabaseWrapper
+
+from core.db.pool import get_pool
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    """PostgreSQL backend with connection health checks and pooling
+
+    Two optional keys in the database settings control it:
+
+    CONN_HEALTH_CHECKS: check a reused connection still works before the
+    first query of each request, and reconnect if it does not.
+
+    POOL: a dict with MAX_SIZE and optionally TIMEOUT and MAX_LIFETIME.
+    When MAX_SIZE is set, connections are borrowed from a process wide
+    pool and handed back at the end of each request, so CONN_MAX_AGE has
+    no effect.
+    """
+
+    health_check_done = False
+
+    @property
+    def pool_options(self):
+        options = self.settings_dict.get('POOL') or {}
+        return options if options.get('MAX_SIZE') else None
+
+    @property
+    def health_checks(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def _pool(self, conn_params):
+        options = self.pool_options
+        return get_pool(
+            conn_params, options['MAX_SIZE'], options.get('TIMEOUT', 10),
+            options.get('MAX_LIFETIME')
+        )
+
+    def get_new_connection(self, conn_params):
+        if self.pool_options is None:
+            connection = super().get_new_connection(conn_params)
+            self.health_check_done = True
+            return connection
+
+        connection = self._pool(conn_params).get(
+            health_check=self.health_checks
+        )
+        self._pooled_params = conn_params
+        self.health_check_done = True
+
+        # As in the stock backend, but a reused connection may already
+        # be at the configured isolation level
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        params = getattr(self, '_pooled_params', None)
+        if self.connection is None or params is None:
+            return super()._close()
+        self._pooled_params = None
+        with self.wrap_database_errors:
+            self._pool(params).put(self.connection)
+
+    def ensure_connection(self):
+        if (self.connection is not None and self.health_checks and
+                not self.health_check_done and not self.in_atomic_block):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        if (self.connection is not None and self.pool_options and
+                not self.in_atomic_block):
+            self.close()
+            return
+        super().close_if_unusable_or_obsolete()
+        # Check the connection again before the next request uses it
+        self.health_check_done = False
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No pooled connection became free in time"""
+
+
+class ConnectionPool:
+    """Thread safe pool of open psycopg2 connections
+
+    At most max_size connections are checked out at once; callers wait
+    up to timeout seconds for one to be returned. Idle connections older
+    than max_lifetime seconds are closed instead of being reused.
+    """
+
+    def __init__(self, conn_params, max_size, timeout=10, max_lifetime=None):
+        self.conn_params = conn_params
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self._idle = []
+        self._opened = {}
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+
+    def _expired(self, connection):
+        if self.max_lifetime is None:
+            return False
+        opened = self._opened.get(id(connection), 0)
+        return time.monotonic() - opened >= self.max_lifetime
+
+    def _discard(self, connection):
+        self._opened.pop(id(connection), None)
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def get(self, health_check=False):
+        """Check out a connection, opening one if none are idle"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'No database connection free after {self.timeout}s'
+            )
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    break
+                if connection.closed or self._expired(connection):
+                    self._discard(connection)
+                elif health_check and not self._is_usable(connection):
+                    self._discard(connection)
+                else:
+                    return connection
+
+            connection = psycopg2.connect(**self.conn_params)
+            self._opened[id(connection)] = time.monotonic()
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, connection):
+        """Return a checked out connection, rolling back open work"""
+        try:
+            status = None
+            if not connection.closed:
+                status = connection.get_transaction_status()
+            if status in (extensions.TRANSACTION_STATUS_INTRANS,
+                          extensions.TRANSACTION_STATUS_INERROR):
+                connection.rollback()
+                status = connection.get_transaction_status()
+
+            if status == extensions.TRANSACTION_STATUS_IDLE and \
+                    not self._expired(connection):
+                with self._lock:
+                    self._idle.append(connection)
+            else:
+                self._discard(connection)
+        except psycopg2.Error:
+            self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._discard(connection)
+
+    @staticmethod
+    def _is_usable(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(conn_params, max_size, timeout=10, max_lifetime=None):
+    """Return the process wide pool for a set of connection parameters"""
+    key = repr(sorted(conn_params.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(conn_params, max_size, timeout,
+                                  max_lifetime)
+            _pools[key] = pool
+        return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
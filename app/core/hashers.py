@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, \
+    PBKDF2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with its costs taken from settings
+
+    Django rehashes a stored password on the next successful login when
+    its costs no longer match, so the costs can be tuned at any time.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with its iteration count taken from settings"""
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
@@ -0,0 +1,333 @@
+import io
+import json
+import random
+import time
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.benchmarking import BenchmarkConnections, allowed_host
+from core.management.commands.benchmark_serving import percentile
+from core.models import Tag, Ingredient, Recipe
+from recipe.sample_data import DISHES, delete_users, sample_users, \
+    seed_recipes
+
+
+EMAIL_PREFIX = 'benchmark-api'
+
+# Options a baseline is only comparable under when they are the same
+BASELINE_OPTIONS = ('users', 'recipes', 'tags', 'ingredients', 'seed',
+                    'requests', 'concurrency')
+
+
+class Dataset:
+    """What the benchmark requests pick from for each seeded user"""
+
+    def __init__(self, users):
+        self.users = []
+        for user in users:
+            token, _ = Token.objects.get_or_create(user=user)
+            self.users.append({
+                'token': token.key,
+                'recipes': list(Recipe.objects.filter(user=user)
+                                .order_by('id')
+                                .values_list('id', flat=True)[:1000]),
+                'tags': list(Tag.objects.filter(user=user)
+                             .values_list('id', flat=True)),
+                'ingredients': list(Ingredient.objects.filter(user=user)
+                                    .values_list('id', flat=True)),
+            })
+
+
+def recipe_list(rng, user):
+    return 'GET', reverse('recipe:recipe-list'), {}, None
+
+
+def recipe_list_by_tag(rng, user):
+    return 'GET', reverse('recipe:recipe-list'), {
+        'tags': rng.choice(user['tags'])
+    }, None
+
+
+def recipe_search(rng, user):
+    return 'GET', reverse('recipe:recipe-list'), {
+        'search': rng.choice(DISHES).split()[-1]
+    }, None
+
+
+def recipe_detail(rng, user):
+    recipe_id = rng.choice(user['recipes'])
+    return 'GET', reverse('recipe:recipe-detail', args=[recipe_id]), {}, \
+        None
+
+
+def tag_list(rng, user):
+    return 'GET', reverse('recipe:tag-list'), {}, None
+
+
+def ingredient_list_popular(rng, user):
+    return 'GET', reverse('recipe:ingredient-list'), {
+        'sort': 'popular'
+    }, None
+
+
+def tag_autocomplete(rng, user):
+    return 'GET', reverse('recipe:tag-autocomplete'), {
+        'q': rng.choice('bdflpqsvw')
+    }, None
+
+
+def recipe_create(rng, user):
+    return 'POST', reverse('recipe:recipe-list'), {}, {
+        'title': f'Benchmark {rng.choice(DISHES)}',
+        'time_minutes': rng.randint(5, 120),
+        'price': '9.99',
+        'tags': rng.sample(user['tags'], min(2, len(user['tags']))),
+        'ingredients': rng.sample(user['ingredients'],
+                                  min(5, len(user['ingredients']))),
+    }
+
+
+def recipe_update(rng, user):
+    recipe_id = rng.choice(user['recipes'])
+    return 'PATCH', reverse('recipe:recipe-detail', args=[recipe_id]), {}, {
+        'time_minutes': rng.randint(5, 120),
+    }
+
+
+ENDPOINTS = {
+    'recipe-list': recipe_list,
+    'recipe-list-by-tag': recipe_list_by_tag,
+    'recipe-search': recipe_search,
+    'recipe-detail': recipe_detail,
+    'tag-list': tag_list,
+    'ingredient-list-popular': ingredient_list_popular,
+    'tag-autocomplete': tag_autocomplete,
+    'recipe-create': recipe_create,
+    'recipe-update': recipe_update,
+}
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API against a seeded dataset"""
+
+    help = ('Seed users with recipes, tags and ingredients, send requests '
+            'to each API endpoint through the URL routes and report '
+            'throughput and latency, compared against a baseline file')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5,
+                            help='Users to seed')
+        parser.add_argument('--recipes', type=int, default=2000,
+                            help='Recipes seeded for each user')
+        parser.add_argument('--tags', type=int, default=200,
+                            help='Tags seeded for each user')
+        parser.add_argument('--ingredients', type=int, default=300,
+                            help='Ingredients seeded for each user')
+        parser.add_argument('--seed', type=int, default=1,
+                            help='Random seed for the data and requests')
+        parser.add_argument('--reseed', action='store_true',
+                            help='Replace data left by an earlier run')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests sent to each endpoint')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Threads sending requests at once')
+        parser.add_argument('--endpoint', action='append',
+                            choices=sorted(ENDPOINTS),
+                            help='Endpoint to test, by default all of them')
+        parser.add_argument('--baseline',
+                            help='JSON file of earlier results to compare '
+                                 'against')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write these results to the baseline file')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Fraction a result may be worse than the '
+                                 'baseline before it counts as a regression')
+
+    def handle(self, *args, **options):
+        benchmark = BenchmarkConnections()
+        if not benchmark.shared:
+            raise CommandError('A private in-memory database cannot be '
+                               'shared with the benchmark threads')
+        connection = connections[DEFAULT_DB_ALIAS]
+        if options['concurrency'] > 1 and connection.vendor == 'sqlite' \
+                and connection.is_in_memory_db():
+            self.stdout.write('Each write locks an in-memory database, so '
+                              'using one thread')
+            options['concurrency'] = 1
+
+        dataset = Dataset(self.seed(options))
+        results = {}
+        with benchmark:
+            for name in options['endpoint'] or ENDPOINTS:
+                results[name] = self.run_endpoint(
+                    benchmark, ENDPOINTS[name], dataset, options
+                )
+                self.stdout.write(self.format_result(name, results[name]))
+
+        if options['baseline']:
+            if options['save_baseline']:
+                self.save_baseline(options['baseline'], results, options)
+            else:
+                self.compare(options['baseline'], results, options)
+
+    def seed(self, options):
+        """Return the benchmark users, seeding them if needed"""
+        users = sample_users(EMAIL_PREFIX)
+        first = users.order_by('id').first()
+        # Earlier runs add recipes through the create endpoint, so only
+        # too few of them means the data needs seeding again
+        if first and not options['reseed'] \
+                and users.count() == options['users'] \
+                and Tag.objects.filter(user=first).count() == options['tags'] \
+                and Ingredient.objects.filter(user=first).count() == \
+                options['ingredients'] \
+                and Recipe.objects.filter(user=first).count() >= \
+                options['recipes']:
+            return list(users.order_by('id'))
+
+        delete_users(users)
+        started = time.monotonic()
+        created = seed_recipes(
+            EMAIL_PREFIX, options['users'], options['recipes'],
+            options['tags'], options['ingredients'], seed=options['seed']
+        )
+        self.stdout.write(f'Seeded {options["users"]} users with '
+                          f'{options["recipes"]} recipes each in '
+                          f'{time.monotonic() - started:.1f}s')
+        return created
+
+    def run_endpoint(self, benchmark, build, dataset, options):
+        """Send the requests for one endpoint and return its results"""
+        handler = WSGIHandler()
+        threads = max(options['concurrency'], 1)
+        counts = [options['requests'] // threads] * threads
+        counts[0] += options['requests'] % threads
+        latencies = []
+        errors = []
+
+        def work(index, count):
+            rng = random.Random(f'{options["seed"]}-{build.__name__}-'
+                                f'{index}')
+            for _ in range(count):
+                user = rng.choice(dataset.users)
+                status, elapsed = self.request(
+                    handler, user['token'], *build(rng, user)
+                )
+                if status < 400:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(status)
+
+        started = time.perf_counter()
+        benchmark.run(work, counts)
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'errors': len(errors),
+        }
+
+    def request(self, handler, token, method, path, query, body):
+        """Send one request through Django, returning status and seconds"""
+        content = json.dumps(body).encode() if body is not None else b''
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(query),
+            'HTTP_AUTHORIZATION': f'Token {token}',
+            'HTTP_HOST': allowed_host(),
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(content)),
+            'wsgi.input': io.BytesIO(content),
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+        started = time.perf_counter()
+        response = handler(environ, lambda status, headers: statuses.append(
+            status
+        ))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return int(statuses[0].split()[0]), time.perf_counter() - started
+
+    def format_result(self, name, result):
+        return (f'{name}: {result["requests_per_second"]:.1f} requests/s, '
+                f'p50 {result["p50_ms"]:.1f} ms, '
+                f'p95 {result["p95_ms"]:.1f} ms, '
+                f'p99 {result["p99_ms"]:.1f} ms, '
+                f'{result["errors"]} errors')
+
+    def save_baseline(self, path, results, options):
+        """Write results and the settings that produced them to path"""
+        baseline = {
+            'options': {key: options[key] for key in BASELINE_OPTIONS},
+            'database': connections[DEFAULT_DB_ALIAS].vendor,
+            'results': results,
+        }
+        with open(path, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        self.stdout.write(f'Saved baseline to {path}')
+
+    def compare(self, path, results, options):
+        """Report changes against the baseline, failing on regressions"""
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f'No baseline at {path}, run with '
+                               f'--save-baseline to create it')
+
+        current = {key: options[key] for key in BASELINE_OPTIONS}
+        saved_options = saved.get('options') or {}
+        changed = [f'{key} {saved_options.get(key)} -> {current[key]}'
+                   for key in BASELINE_OPTIONS
+                   if saved_options.get(key) != current[key]]
+        vendor = connections[DEFAULT_DB_ALIAS].vendor
+        if saved.get('database') != vendor:
+            changed.append(f'database {saved.get("database")} -> {vendor}')
+        if changed:
+            raise CommandError(
+                f'The baseline at {path} was saved with other settings '
+                f'({", ".join(changed)}), run with --save-baseline to '
+                f'replace it'
+            )
+
+        baseline = saved['results']
+        tolerance = options['tolerance']
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            p95 = result['p95_ms'] / before['p95_ms'] - 1 \
+                if before['p95_ms'] else 0.0
+            rate = result['requests_per_second'] / \
+                before['requests_per_second'] - 1 \
+                if before['requests_per_second'] else 0.0
+            worse = p95 > tolerance or rate < -tolerance or \
+                result['errors'] > before['errors']
+            self.stdout.write(
+                f'{name}: p95 {p95:+.0%}, throughput {rate:+.0%} against '
+                f'the baseline{" REGRESSION" if worse else ""}'
+            )
+            if worse:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(
+                f'Slower than the baseline: {", ".join(regressions)}'
+            )
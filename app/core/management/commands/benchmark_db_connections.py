@@ -0,0 +1,108 @@
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.authtoken.models import Token
+
+from core.benchmarking import BenchmarkConnections, allowed_host
+
+
+BENCHMARK_EMAIL = 'benchmark-db-connections@example.com'
+
+MODES = ('fresh', 'persistent', 'pooled')
+
+
+class Command(BaseCommand):
+    """Django command to compare request rates across connection modes"""
+
+    help = ('Measure requests per second with new, persistent and pooled '
+            'database connections')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Requests sent in each mode')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Threads sending requests at once')
+        parser.add_argument('--path', default='/api/recipe/tags/',
+                            help='Authenticated GET endpoint to request')
+        parser.add_argument('--mode', action='append', choices=MODES,
+                            help='Mode to time, by default all of them')
+
+    def handle(self, *args, **options):
+        if not BenchmarkConnections().shared:
+            raise CommandError('A private in-memory database cannot be '
+                               'shared with the benchmark threads')
+        users = get_user_model().objects
+        # A run that was killed before its cleanup leaves the user behind
+        users.filter(email=BENCHMARK_EMAIL).delete()
+        user = users.create_user(BENCHMARK_EMAIL)
+        token = Token.objects.create(user=user)
+        poolable = hasattr(connections[DEFAULT_DB_ALIAS], 'pool_options')
+        try:
+            for mode in options['mode'] or MODES:
+                if mode == 'pooled' and not poolable:
+                    self.stdout.write(
+                        f'{mode}: skipped, the database backend has no pool'
+                    )
+                    continue
+                with BenchmarkConnections(**self.overrides(mode, options)) \
+                        as benchmark:
+                    rate = self.run_mode(benchmark, token.key, options)
+                self.stdout.write(f'{mode}: {rate:.1f} requests/s')
+        finally:
+            user.delete()
+
+    def overrides(self, mode, options):
+        """Return the connection settings that put the benchmark in mode"""
+        default = connections[DEFAULT_DB_ALIAS].settings_dict
+        pool = dict(default.get('POOL') or {}, MAX_SIZE=0)
+        if mode == 'pooled':
+            pool['MAX_SIZE'] = max(options['threads'], 1)
+        return {
+            'POOL': pool,
+            'CONN_MAX_AGE': None if mode == 'persistent' else 0,
+        }
+
+    def run_mode(self, benchmark, key, options):
+        """Send the requests from worker threads, returning requests/s"""
+        handler = WSGIHandler()
+        environ = {
+            'PATH_INFO': options['path'],
+            'HTTP_AUTHORIZATION': f'Token {key}',
+            'HTTP_HOST': allowed_host(),
+        }
+        setup_testing_defaults(environ)
+        threads = max(options['threads'], 1)
+        per_thread = [options['requests'] // threads] * threads
+        per_thread[0] += options['requests'] % threads
+        errors = []
+
+        def work(index, count):
+            for _ in range(count):
+                status = self.request(handler, dict(environ))
+                if not status.startswith('200'):
+                    errors.append(status)
+
+        started = time.perf_counter()
+        benchmark.run(work, per_thread)
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            self.stderr.write(f'{len(errors)} requests failed: {errors[0]}')
+        return options['requests'] / elapsed
+
+    def request(self, handler, environ):
+        """Run one request through Django the way a WSGI server would"""
+        statuses = []
+        response = handler(environ, lambda status, headers: statuses.append(
+            status
+        ))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return statuses[0]
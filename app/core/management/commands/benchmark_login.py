@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    """Django command to measure password checks per second on one core"""
+
+    help = 'Measure login password checks per second for each hasher policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0,
+                            help='How long to time each policy for')
+        parser.add_argument('--policy', action='append',
+                            choices=sorted(settings.PASSWORD_HASHER_POLICIES),
+                            help='Policy to time, by default all of them')
+
+    def handle(self, *args, **options):
+        policies = options['policy'] or sorted(
+            settings.PASSWORD_HASHER_POLICIES
+        )
+        for policy in policies:
+            hasher = import_string(
+                settings.PASSWORD_HASHER_POLICIES[policy][0]
+            )()
+            rate = self.time_hasher(hasher, options['seconds'])
+            self.stdout.write(
+                f'{policy}: {rate:.1f} logins/s per core '
+                f'({1000 / rate:.1f} ms each)'
+            )
+
+    def time_hasher(self, hasher, seconds):
+        """Return how many passwords hasher checks per second"""
+        encoded = hasher.encode('correct horse battery', hasher.salt())
+
+        checks = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            hasher.verify('correct horse battery', encoded)
+            checks += 1
+            now = time.perf_counter()
+            if now >= deadline:
+                return checks / (now - started)
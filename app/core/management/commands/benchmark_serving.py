@@ -0,0 +1,151 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from core.benchmarking import allowed_host
+
+
+BENCHMARK_EMAIL = 'benchmark-serving@example.com'
+
+MODES = ('runserver', 'wsgi', 'asgi')
+
+
+def percentile(values, fraction):
+    """Return the value below which fraction of sorted values fall"""
+    if not values:
+        return 0.0
+    index = min(int(len(values) * fraction), len(values) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    """Django command to load test the app under each way of serving it"""
+
+    help = ('Start the app with runserver and with gunicorn in WSGI and '
+            'ASGI mode, and compare throughput and latency. Needs a '
+            'database the server processes can share.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=MODES,
+                            help='Mode to test, by default all of them')
+        parser.add_argument('--path', default='/api/recipe/tags/',
+                            help='Authenticated GET endpoint to request')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Clients sending requests at once')
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Seconds to send requests for in each mode')
+        parser.add_argument('--port', type=int, default=8765,
+                            help='Port to start each server on')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects
+        # A run that was killed before its cleanup leaves the user behind
+        users.filter(email=BENCHMARK_EMAIL).delete()
+        user = users.create_user(BENCHMARK_EMAIL)
+        token = Token.objects.create(user=user)
+        try:
+            for mode in options['mode'] or MODES:
+                with self.server(mode, options['port']):
+                    latencies, errors, elapsed = self.load(token.key,
+                                                           options)
+                latencies.sort()
+                self.stdout.write(
+                    f'{mode}: {len(latencies) / elapsed:.1f} requests/s, '
+                    f'p50 {percentile(latencies, 0.5) * 1000:.1f} ms, '
+                    f'p99 {percentile(latencies, 0.99) * 1000:.1f} ms, '
+                    f'{errors} errors'
+                )
+        finally:
+            user.delete()
+
+    def server(self, mode, port):
+        """Return a context manager running the app in mode on port"""
+        address = f'127.0.0.1:{port}'
+        env = dict(os.environ, SERVER_MODE=mode, GUNICORN_ACCESS_LOG='')
+        if mode == 'runserver':
+            command = [sys.executable, 'manage.py', 'runserver',
+                       '--noreload', address]
+        else:
+            command = [sys.executable, '-m', 'gunicorn', '-c',
+                       'gunicorn.conf.py', '--bind', address]
+        return RunningServer(command, env, settings.BASE_DIR, port)
+
+    def load(self, key, options):
+        """Send requests from concurrent clients, returning the results"""
+        latencies = []
+        errors = []
+        headers = {'Authorization': f'Token {key}', 'Host': allowed_host()}
+        deadline = time.monotonic() + options['duration']
+
+        def client():
+            conn = http.client.HTTPConnection('127.0.0.1', options['port'])
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', options['path'], headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    errors.append(1)
+                    conn.close()
+                    continue
+                if response.status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors.append(response.status)
+            conn.close()
+
+        clients = [threading.Thread(target=client)
+                   for _ in range(options['concurrency'])]
+        started = time.monotonic()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        return latencies, len(errors), time.monotonic() - started
+
+
+class RunningServer:
+    """Run a server process for the duration of a with block"""
+
+    def __init__(self, command, env, cwd, port, startup_timeout=30):
+        self.command = command
+        self.env = env
+        self.cwd = cwd
+        self.port = port
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.command, env=self.env, cwd=self.cwd,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'{self.command[0]} exited on start up')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), 1).close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise CommandError(f'Server did not start on port {self.port}')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.sample_data import delete_users, sample_users, seed_recipes
+
+
+class Command(BaseCommand):
+    """Django command to generate a large synthetic dataset"""
+
+    help = ('Generate users with recipes, tags and ingredients using bulk '
+            'inserts, the same every time for the same seed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10,
+                            help='Users to create')
+        parser.add_argument('--recipes-per-user', type=int, default=1000,
+                            help='Recipes created for each user')
+        parser.add_argument('--tags-per-user', type=int, default=100,
+                            help='Tags created for each user')
+        parser.add_argument('--ingredients-per-user', type=int, default=200,
+                            help='Ingredients created for each user')
+        parser.add_argument('--zipf', type=float, default=1.0,
+                            help='Exponent of the Zipf distribution of tag '
+                                 'and ingredient popularity, 0 for uniform')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed for the data')
+        parser.add_argument('--email-prefix', default='sample',
+                            help='Users get emails <prefix>-<n>@example.com')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete users left by an earlier run first')
+
+    def handle(self, *args, **options):
+        if options['zipf'] < 0:
+            raise CommandError('--zipf cannot be negative')
+        users = sample_users(options['email_prefix'])
+        if users.exists():
+            if not options['replace']:
+                raise CommandError(
+                    f'Users with the prefix {options["email_prefix"]} '
+                    f'exist, use --replace or another --email-prefix'
+                )
+            delete_users(users)
+
+        self.started = time.monotonic()
+        self.done = 0
+        seed_recipes(
+            options['email_prefix'], options['users'],
+            options['recipes_per_user'], options['tags_per_user'],
+            options['ingredients_per_user'], seed=options['seed'],
+            zipf=options['zipf'], progress=self.report_progress
+        )
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["users"]} users with {self.done} recipes '
+            f'in {elapsed:.1f}s, {self.done / max(elapsed, 1e-6):.0f} '
+            f'recipes/s'
+        ))
+
+    def report_progress(self, user, recipes):
+        self.done += recipes
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'{user.email}: {recipes} recipes, {self.done} in total, '
+            f'{self.done / max(elapsed, 1e-6):.0f} recipes/s'
+        )
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importing import IMPORT_FORMATS, RecipeImporter, guess_format
+
+
+class Command(BaseCommand):
+    """Django command to import recipes for a user from NDJSON or CSV"""
+
+    help = 'Import recipes for a user from an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--user', required=True,
+                            help='Email of the user to import recipes for')
+        parser.add_argument('--input', choices=IMPORT_FORMATS,
+                            help='File format, by default from its extension')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows written per transaction')
+
+    def handle(self, *args, **options):
+        fmt = options['input'] or guess_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the file format, use --input')
+        try:
+            user = get_user_model().objects.get(
+                email=get_user_model().objects.normalize_email(
+                    options['user']
+                )
+            )
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}')
+
+        importer = RecipeImporter(user, batch_size=options['batch_size'],
+                                  progress=self.report_progress)
+        with open(options['path'], newline='', encoding='utf-8') as lines:
+            stats = importer.run(fmt, lines)
+
+        for error in stats.errors:
+            self.stderr.write(f'Line {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.created} recipes from {stats.rows} rows '
+            f'({stats.failed} failed, {stats.tags_created} tags and '
+            f'{stats.ingredients_created} ingredients created) in '
+            f'{stats.elapsed:.1f}s, {stats.rows_per_second:.0f} rows/s'
+        ))
+
+    def report_progress(self, stats):
+        self.stdout.write(
+            f'{stats.rows} rows read, {stats.created} imported, '
+            f'{stats.failed} failed, {stats.rows_per_second:.0f} rows/s'
+        )
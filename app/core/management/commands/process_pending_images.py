@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.images import process_recipe_image
+
+
+class Command(BaseCommand):
+    """Django command to process recipe images left pending"""
+
+    help = ('Process recipe images still pending after a while, such as '
+            'those whose task was lost when a worker restarted')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=600,
+                            help='Seconds since the upload before a pending '
+                                 'image counts as stranded')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        pending = Recipe.objects.filter(
+            image_status=Recipe.IMAGE_PENDING
+        ).exclude(image='').exclude(image=None).only('id', 'image')
+
+        processed = 0
+        for recipe in pending.iterator():
+            if self.uploaded(recipe) > cutoff:
+                continue
+            process_recipe_image(recipe.id, recipe.image.name)
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} pending images'
+        ))
+
+    def uploaded(self, recipe):
+        """Return when the recipe's image was stored"""
+        try:
+            return recipe.image.storage.get_modified_time(recipe.image.name)
+        except (NotImplementedError, OSError):
+            # Treat images the storage cannot date as long stranded
+            return timezone.now() - timedelta(days=365)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Tag, Ingredient
+from recipe.counters import repair_recipe_counts
+
+
+class Command(BaseCommand):
+    """Django command to recount the recipes using each tag and ingredient"""
+
+    help = 'Correct tag and ingredient recipe counts that have drifted'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            tags = repair_recipe_counts(Tag, 'tags')
+            ingredients = repair_recipe_counts(Ingredient, 'ingredients')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {tags} tags and {ingredients} ingredients'
+        ))
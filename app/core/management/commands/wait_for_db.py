@@ -1,23 +1,82 @@
+import random
 import time
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to pause execution until DB is available"""
 
+    help = 'Wait until the database answers queries, retrying with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database alias to wait for')
+        parser.add_argument('--timeout', type=float, default=60.0,
+                            help='Seconds to wait before giving up')
+        parser.add_argument('--initial-delay', type=float, default=0.05,
+                            help='Seconds to wait after the first failure')
+        parser.add_argument('--max-delay', type=float, default=2.0,
+                            help='Longest wait between attempts')
+        parser.add_argument('--wait-for-migrations', action='store_true',
+                            help='Also wait until no migrations are pending')
+
+    def probe(self, connection):
+        """Run a query on connection, raising if it cannot answer"""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+
+    def pending_migrations(self, connection):
+        """Return how many migrations have not been applied yet"""
+        executor = MigrationExecutor(connection)
+        targets = executor.loader.graph.leaf_nodes()
+        return len(executor.migration_plan(targets))
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for Database...')
-        db_conn = None
+        connection = connections[options['database']]
+        started = time.monotonic()
+        deadline = started + options['timeout']
+        delay = options['initial_delay']
+        attempts = 0
 
-        while not db_conn:
+        while True:
+            attempts += 1
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second')
-                time.sleep(1)
+                self.probe(connection)
+                pending = 0
+                if options['wait_for_migrations']:
+                    pending = self.pending_migrations(connection)
+                if not pending:
+                    break
+                reason = f'{pending} migrations pending'
+            except OperationalError as exc:
+                # Drop the broken connection so the next attempt reconnects
+                if not connection.in_atomic_block:
+                    connection.close()
+                reason = (str(exc).strip() or 'unavailable').splitlines()[0]
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CommandError(
+                    f'Database not ready after {options["timeout"]:g}s '
+                    f'({attempts} attempts): {reason}'
+                )
+            # Jitter keeps many containers from retrying in step
+            pause = min(random.uniform(delay / 2, delay), remaining)
+            self.stdout.write(
+                f'Database not ready ({reason}), retrying in {pause:.2f}s'
+            )
+            time.sleep(pause)
+            delay = min(delay * 2, options['max_delay'])
 
-        self.stdout.write(self.style.SUCCESS('Database is available!'))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Database is available! Ready after {elapsed:.2f}s '
+            f'({attempts} attempts)'
+        ))
@@ -0,0 +1,212 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from rest_framework.serializers import BaseSerializer
+
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (help, buckets, the RequestStats attribute observed)
+REQUEST_METRICS = {
+    'http_request_duration_seconds': (
+        'Wall time spent handling a request', SECONDS_BUCKETS, 'duration'
+    ),
+    'http_request_db_seconds': (
+        'Time spent waiting on SQL queries during a request',
+        SECONDS_BUCKETS, 'db_time'
+    ),
+    'http_request_queries': (
+        'SQL queries run during a request', COUNT_BUCKETS, 'queries'
+    ),
+    'http_request_duplicate_queries': (
+        'SQL queries repeating an earlier one with the same parameters',
+        COUNT_BUCKETS, 'duplicate_queries'
+    ),
+    'http_request_serializer_seconds': (
+        'Time spent validating and serializing data during a request',
+        SECONDS_BUCKETS, 'serializer_time'
+    ),
+    'http_response_size_bytes': (
+        'Size of the response body', BYTES_BUCKETS, 'response_size'
+    ),
+}
+
+
+class Histogram:
+    """Cumulative bucket counts and a running sum of observed values"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        """Yield (le, cumulative count) for each bucket and +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRegistry:
+    """Per endpoint request histograms held in this process
+
+    Each worker process keeps its own, which Prometheus adds up across
+    the scraped targets.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._histograms = {name: {} for name in metrics}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, stats):
+        """Record one request's stats under a tuple of label pairs"""
+        with self._lock:
+            for name, (_, buckets, attribute) in self.metrics.items():
+                value = getattr(stats, attribute)
+                if value is None:
+                    continue
+                histogram = self._histograms[name].get(labels)
+                if histogram is None:
+                    histogram = Histogram(buckets)
+                    self._histograms[name][labels] = histogram
+                histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            for histograms in self._histograms.values():
+                histograms.clear()
+
+    def render(self):
+        """Return every histogram in the Prometheus text format"""
+        lines = []
+        with self._lock:
+            for name, (help_text, _, _) in self.metrics.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(
+                        self._histograms[name].items()):
+                    pairs = ','.join(f'{key}="{_escape(value)}"'
+                                     for key, value in labels)
+                    for bound, count in histogram.samples():
+                        lines.append(
+                            f'{name}_bucket{{{pairs},le="{bound}"}} {count}'
+                        )
+                    lines.append(f'{name}_sum{{{pairs}}} {histogram.sum}')
+                    lines.append(
+                        f'{name}_count{{{pairs}}} {sum(histogram.counts)}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+registry = MetricsRegistry(REQUEST_METRICS)
+
+
+class RequestStats:
+    """Measurements gathered while handling one request"""
+
+    def __init__(self):
+        self.duration = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.duplicate_queries = 0
+        self.serializer_time = 0.0
+        self.response_size = None
+        self._seen_queries = set()
+        self._timing = False
+
+    def record_query(self, execute, sql, params, many, context):
+        """Time a query, for use with connection.execute_wrapper()"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            key = (sql, repr(params))
+            if key in self._seen_queries:
+                self.duplicate_queries += 1
+            else:
+                self._seen_queries.add(key)
+
+
+_state = threading.local()
+
+
+def current_stats():
+    """Return the stats of the request being measured on this thread"""
+    return getattr(_state, 'stats', None)
+
+
+@contextmanager
+def measure_request(stats):
+    """Make stats the current request's stats inside the block"""
+    _state.stats = stats
+    try:
+        yield stats
+    finally:
+        _state.stats = None
+
+
+@contextmanager
+def serializer_timer():
+    """Add the time spent in the block to the request's serializer time
+
+    Nested timers only count once, so a serializer calling another one
+    is not added twice.
+    """
+    stats = current_stats()
+    if stats is None or stats._timing:
+        yield
+        return
+    stats._timing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - started
+        stats._timing = False
+
+
+_instrumented = False
+
+
+def instrument_serializers():
+    """Time every DRF serializer's is_valid() and data
+
+    Only called when metrics are on, so serializers are left untouched
+    otherwise.
+    """
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    data = BaseSerializer.data.fget
+    is_valid = BaseSerializer.is_valid
+
+    def timed_data(self):
+        with serializer_timer():
+            return data(self)
+
+    def timed_is_valid(self, *args, **kwargs):
+        with serializer_timer():
+            return is_valid(self, *args, **kwargs)
+
+    BaseSerializer.data = property(timed_data)
+    BaseSerializer.is_valid = timed_is_valid
@@ -0,0 +1,114 @@
+import hashlib
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+
+from core import metrics
+from core.routers import pin_to_primary
+
+
+REPLICA_PIN_COOKIE = 'replica_pin'
+
+
+def _token_pin_key(request):
+    """Return the cache key pinning this request's API token, if any"""
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    digest = hashlib.sha256(authorization.encode()).hexdigest()
+    return f'replica-pin:{digest}'
+
+
+class ReplicaPinningMiddleware:
+    """Keep a client's reads on the primary for a while after it writes
+
+    Writes set a cookie and, for API token clients that ignore cookies,
+    a cache entry keyed by the token. Either one pins the client's reads
+    for REPLICA_PIN_SECONDS so it always sees its own changes. The entry
+    goes in the REPLICA_PIN_CACHE_ALIAS cache, which has to be shared by
+    every process or a pin set by one is missed by the others.
+    """
+
+    def __init__(self, get_response):
+        if settings.DATABASE_REPLICAS:
+            alias = settings.REPLICA_PIN_CACHE_ALIAS
+            if isinstance(caches[alias], (LocMemCache, DummyCache)):
+                raise ImproperlyConfigured(
+                    f'REPLICA_PIN_CACHE_ALIAS names the {alias} cache, '
+                    f'which is not shared between processes, so token '
+                    f'clients could read a replica behind their own writes'
+                )
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = _token_pin_key(request)
+        writing = request.method not in ('GET', 'HEAD', 'OPTIONS')
+        cache = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+        pinned = (writing or REPLICA_PIN_COOKIE in request.COOKIES or
+                  (key is not None and cache.get(key)))
+        if not pinned:
+            return self.get_response(request)
+
+        with pin_to_primary():
+            response = self.get_response(request)
+
+        if writing and response.status_code < 400:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(REPLICA_PIN_COOKIE, '1', max_age=seconds,
+                                httponly=True)
+            if key is not None:
+                cache.set(key, True, seconds)
+        return response
+
+
+def _endpoint(request):
+    """Return the view and action labels a request resolved to"""
+    match = request.resolver_match
+    if match is None:
+        return None
+    view = getattr(match.func, 'cls', None) or match.func
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return (('view', view.__name__), ('action', action))
+
+
+class MetricsMiddleware:
+    """Record the time, queries and response size of each request
+
+    Every resolved view and action gets histograms of wall time, SQL time,
+    query count, repeated queries, serializer time and body size, served
+    at /metrics. With METRICS_ENABLED off the middleware is not loaded.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        metrics.instrument_serializers()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.RequestStats()
+        started = time.perf_counter()
+        with metrics.measure_request(stats), ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(stats.record_query)
+                )
+            response = self.get_response(request)
+        stats.duration = time.perf_counter() - started
+
+        labels = _endpoint(request)
+        if labels is not None:
+            if not response.streaming:
+                stats.response_size = len(response.content)
+            metrics.registry.observe(labels, stats)
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 2.1.15 on 2026-10-17 06:45
+
+from django.db import migrations
+
+
+# Matches the UPPER(name::text) LIKE UPPER('prefix%') that istartswith
+# produces, which a plain index on name cannot serve
+INDEXES = (
+    ('core_tag_name_prefix_idx', 'core_tag'),
+    ('core_ingredient_name_prefix_idx', 'core_ingredient'),
+)
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON {table} '
+            f'(user_id, (upper(name::text)) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in INDEXES:
+        schema_editor.execute(f'DROP INDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
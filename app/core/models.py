@@ -6,6 +6,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 
 
 def recipe_image_file_path(instance, filename):
@@ -16,6 +17,14 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads', 'recipe', filename)
 
 
+def recipe_rendition_file_path(instance, filename):
+    """Generate filepath for a resized copy of a recipe image"""
+    ext = filename.split('.')[-1]
+    filename = f'{uuid.uuid4()}.{ext}'
+
+    return os.path.join('uploads', 'recipe', 'renditions', filename)
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -54,6 +63,15 @@ class Tag(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_tag_user_name_idx'),
+            models.Index(fields=['user', 'recipe_count', 'id'],
+                         name='core_tag_user_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -65,6 +83,15 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_ingredient_user_name_idx'),
+            models.Index(fields=['user', 'recipe_count', 'id'],
+                         name='core_ingredient_user_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -73,6 +100,15 @@ class Ingredient(models.Model):
 class Recipe(models.Model):
     """Recipes Object"""
 
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -83,6 +119,43 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(max_length=16, blank=True,
+                                    choices=IMAGE_STATUS_CHOICES)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'],
+                         name='core_recipe_user_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class RecipeImageRendition(models.Model):
+    """Resized, metadata free copy of a recipe image"""
+
+    recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE,
+                               related_name='renditions')
+    name = models.CharField(max_length=32)
+    format = models.CharField(max_length=8)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    image = models.ImageField(upload_to=recipe_rendition_file_path)
+
+    def __str__(self):
+        return f'{self.recipe} ({self.name} {self.format})'
+
+
+class CollectionVersion(models.Model):
+    """Per-user counter bumped when recipes, tags or ingredients change"""
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL,
+                                on_delete=models.CASCADE,
+                                primary_key=True)
+    version = models.BigIntegerField(default=0)
+    modified = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.user} v{self.version}'
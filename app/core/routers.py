@@ -0,0 +1,51 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_state = threading.local()
+
+
+def is_pinned():
+    """Return whether reads on this thread must go to the primary"""
+    return getattr(_state, 'pinned', 0) > 0
+
+
+@contextmanager
+def pin_to_primary():
+    """Send every read made inside the block to the primary database"""
+    _state.pinned = getattr(_state, 'pinned', 0) + 1
+    try:
+        yield
+    finally:
+        _state.pinned -= 1
+
+
+class ReplicaRouter:
+    """Send reads to a random replica and everything else to the primary
+
+    Reads stay on the primary while pinned, such as for a user who has
+    just written, and inside transactions, whose reads often decide what
+    is written next.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        # A database cache holds token and pin entries that must be seen
+        # as soon as they are written
+        if model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        if (not replicas or is_pinned() or
+                connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
@@ -0,0 +1,87 @@
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from core.routers import pin_to_primary
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTaskQueue:
+    """Run tasks on background worker threads inside this process
+
+    This stands in for an external broker: tasks are lost if the process
+    exits before they run, so they must be safe to retry from a command.
+    Image processing is retried by process_pending_images, which should
+    run periodically wherever workers are recycled.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name=f'task-worker-{i}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            func, args, kwargs = self._queue.get()
+            close_old_connections()
+            try:
+                # Tasks follow the write that queued them, which a replica
+                # may not have caught up with yet
+                with pin_to_primary():
+                    func(*args, **kwargs)
+            except Exception:
+                logger.exception('Task %s failed', func.__name__)
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+    def enqueue(self, func, *args, **kwargs):
+        """Queue func to be called with args on a worker thread"""
+        self._start()
+        self._queue.put((func, args, kwargs))
+
+    def join(self):
+        """Block until every queued task has finished"""
+        self._queue.join()
+
+
+_task_queue = None
+
+
+def get_task_queue():
+    """Return the process wide task queue"""
+    global _task_queue
+    if _task_queue is None:
+        _task_queue = LocalTaskQueue(settings.TASK_QUEUE_WORKERS)
+    return _task_queue
+
+
+def defer(func, *args, **kwargs):
+    """Run func in the background once the current transaction commits
+
+    With TASK_QUEUE_EAGER set the task runs straight away instead, which
+    keeps tests and management commands synchronous.
+    """
+    if settings.TASK_QUEUE_EAGER:
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(
+        lambda: get_task_queue().enqueue(func, *args, **kwargs)
+    )
@@ -0,0 +1,41 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """TestCase assertions that an endpoint's query count stays flat
+
+    Each check seeds datasets of growing size and runs the endpoint once
+    for each, failing when the number of queries changes with the size,
+    the sign of an N+1 query, or goes over the declared budget.
+    """
+
+    budget_sizes = (1, 5, 25)
+
+    def assertQueryBudget(self, budget, seed, run, sizes=None):
+        """Assert run(seed(n)) makes the same, at most budget, queries
+
+        seed(n) builds a dataset of size n and returns whatever run needs
+        to send the request; run returns the response.
+        """
+        counts = {}
+        captured = None
+        for size in sizes or self.budget_sizes:
+            data = seed(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = run(data)
+            self.assertLess(
+                response.status_code, 400,
+                f'Request failed with {response.status_code} at n={size}'
+            )
+            counts[size] = len(queries)
+            captured = queries.captured_queries
+
+        sql = '\n'.join(query['sql'] for query in captured)
+        if len(set(counts.values())) > 1:
+            self.fail(f'Query count grows with n: {counts}\n{sql}')
+        if max(counts.values()) > budget:
+            self.fail(
+                f'{max(counts.values())} queries over the budget of '
+                f'{budget}\n{sql}'
+            )
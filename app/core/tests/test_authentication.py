@@ -0,0 +1,162 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import LocalTokenCache, SharedTokenCache, \
+    get_token_cache
+
+TAGS_URL = reverse('recipe:tag-list')
+MANAGE_USER_URL = reverse('user:manage')
+
+
+class LocalTokenCacheTests(TestCase):
+    """Test the in-process token cache"""
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache drops the least recently used entry when full"""
+        cache = LocalTokenCache(max_entries=2, timeout=60)
+        cache.set('a', 1, cache.generation())
+        cache.set('b', 2, cache.generation())
+        cache.get('a')
+        cache.set('c', 3, cache.generation())
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('core.authentication.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """Test entries are dropped once their timeout passes"""
+        monotonic.return_value = 100
+        cache = LocalTokenCache(max_entries=2, timeout=60)
+        cache.set('a', 1, cache.generation())
+
+        monotonic.return_value = 159
+        self.assertEqual(cache.get('a'), 1)
+        monotonic.return_value = 160
+        self.assertIsNone(cache.get('a'))
+
+    def test_set_skipped_after_delete(self):
+        """Test a value read before an invalidation is not stored"""
+        cache = LocalTokenCache(max_entries=2, timeout=60)
+        generation = cache.generation()
+        cache.delete('a')
+        cache.set('a', 1, generation)
+
+        self.assertIsNone(cache.get('a'))
+
+
+class SharedTokenCacheTests(TestCase):
+    """Test the token cache backed by a Django cache"""
+
+    def test_set_get_and_delete(self):
+        """Test entries round trip and deletes invalidate older reads"""
+        cache = SharedTokenCache('default', timeout=60)
+        cache.set('token-test', 1, cache.generation())
+        self.assertEqual(cache.get('token-test'), 1)
+
+        generation = cache.generation()
+        cache.delete('token-test')
+        cache.set('token-test', 2, generation)
+
+        self.assertIsNone(cache.get('token-test'))
+
+    def test_clear(self):
+        """Test clearing drops every entry"""
+        cache = SharedTokenCache('default', timeout=60)
+        cache.set('token-test', 1, cache.generation())
+
+        cache.clear()
+
+        self.assertIsNone(cache.get('token-test'))
+
+
+@patch('core.authentication._token_cache', None)
+class TokenCacheSettingsTests(TestCase):
+    """Test the token cache chosen for the configured web workers"""
+
+    @override_settings(WEB_WORKERS=1, TOKEN_CACHE_ALIAS='')
+    def test_one_worker_uses_local_cache(self):
+        """Test a single worker can keep tokens in its own memory"""
+        self.assertIsInstance(get_token_cache(), LocalTokenCache)
+
+    @override_settings(WEB_WORKERS=3, TOKEN_CACHE_ALIAS='')
+    def test_workers_need_cache_alias(self):
+        """Test several workers without a shared cache fail to start"""
+        with self.assertRaisesMessage(ImproperlyConfigured,
+                                      'TOKEN_CACHE_ALIAS'):
+            get_token_cache()
+
+    @override_settings(WEB_WORKERS=3, TOKEN_CACHE_ALIAS='default')
+    def test_workers_reject_per_process_cache(self):
+        """Test several workers cannot share a local memory cache"""
+        with self.assertRaisesMessage(ImproperlyConfigured,
+                                      'TOKEN_CACHE_ALIAS'):
+            get_token_cache()
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests with cached tokens"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass',
+            name='Name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def _count_queries(self, url):
+        """Return the number of queries run while fetching url"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx)
+
+    def test_cached_token_saves_token_query(self):
+        """Test requests after the first skip the token and user lookup"""
+        first = self._count_queries(TAGS_URL)
+        cached = [self._count_queries(TAGS_URL) for i in range(5)]
+
+        self.assertEqual(cached, [first - 1] * 5)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops working straight away"""
+        self._count_queries(TAGS_URL)
+
+        self.token.delete()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_refreshes_cached_user(self):
+        """Test updating the user through the API is seen on next request"""
+        self._count_queries(MANAGE_USER_URL)
+
+        self.client.patch(MANAGE_USER_URL, {'name': 'New Name'})
+        res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user's cached token stops working"""
+        self._count_queries(TAGS_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
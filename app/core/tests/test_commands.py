@@ -1,26 +1,348 @@
+import io
+import json
+import os
+import tempfile
+import time
+from contextlib import nullcontext
+from io import StringIO
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from core.benchmarking import BenchmarkConnections
+from core.models import Ingredient, Recipe, RecipeImageRendition, Tag
+from recipe.counters import repair_recipe_counts
+
+WAIT_FOR_DB = 'core.management.commands.wait_for_db.Command'
+SERVING = 'core.management.commands.benchmark_serving'
 
 
 class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for DB when DB is available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
+        out = StringIO()
 
-            self.assertEqual(gi.call_count, 1)
+        call_command('wait_for_db', stdout=out)
+
+        self.assertIn('Database is available!', out.getvalue())
+        self.assertIn('(1 attempts)', out.getvalue())
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
-        """Test waiting for DB"""
+        """Test waiting for DB backs off until a query succeeds"""
+        with patch(WAIT_FOR_DB + '.probe') as probe:
+            probe.side_effect = [OperationalError('refused')] * 5 + [None]
+            call_command('wait_for_db', initial_delay=0.1, max_delay=0.5,
+                         stdout=StringIO())
+
+            self.assertEqual(probe.call_count, 6)
+
+        delays = [call[0][0] for call in ts.call_args_list]
+        self.assertEqual(len(delays), 5)
+        for delay, limit in zip(delays, (0.1, 0.2, 0.4, 0.5, 0.5)):
+            self.assertGreaterEqual(delay, limit / 2)
+            self.assertLessEqual(delay, limit)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """Test giving up once the timeout has passed"""
+        with patch(WAIT_FOR_DB + '.probe') as probe:
+            probe.side_effect = OperationalError('refused')
+            with self.assertRaisesMessage(CommandError, 'refused'):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_migrations(self, ts):
+        """Test optionally waiting for migrations to be applied"""
+        out = StringIO()
+        with patch(WAIT_FOR_DB + '.pending_migrations') as pending:
+            pending.side_effect = [2, 0]
+            call_command('wait_for_db', wait_for_migrations=True, stdout=out)
+
+            self.assertEqual(pending.call_count, 2)
+        self.assertIn('2 migrations pending', out.getvalue())
+
+    def test_wait_for_db_counts_pending_migrations(self):
+        """Test a migrated database has no pending migrations"""
+        out = StringIO()
+
+        call_command('wait_for_db', wait_for_migrations=True, stdout=out)
+
+        self.assertIn('Database is available!', out.getvalue())
+
+    def test_import_recipes(self):
+        """Test importing recipes from a file in several batches"""
+        user = get_user_model().objects.create_user('test@test.com', 'pass')
+        out = StringIO()
+
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as ntf:
+            for i in range(5):
+                ntf.write(json.dumps({
+                    'title': f'Recipe {i}', 'time_minutes': 5,
+                    'price': '1.00', 'tags': ['Quick'], 'ingredients': []
+                }) + '\n')
+            ntf.flush()
+            call_command('import_recipes', ntf.name, user='test@test.com',
+                         batch_size=2, stdout=out)
+
+        self.assertEqual(Recipe.objects.filter(user=user).count(), 5)
+        self.assertEqual(user.tag_set.count(), 1)
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('Imported 5 recipes from 5 rows', out.getvalue())
+
+    def test_repair_recipe_counts(self):
+        """Test drifted recipe counts are recomputed from the links"""
+        user = get_user_model().objects.create_user('test@test.com', 'pass')
+        tag = Tag.objects.create(user=user, name='Dinner')
+        unused = Tag.objects.create(user=user, name='Lunch')
+        recipe = Recipe.objects.create(user=user, title='Curry',
+                                       time_minutes=5, price=1)
+        recipe.tags.add(tag)
+        Tag.objects.update(recipe_count=7)
+        out = StringIO()
+
+        call_command('repair_recipe_counts', stdout=out)
+
+        tag.refresh_from_db()
+        unused.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+        self.assertEqual(unused.recipe_count, 0)
+        self.assertIn('Repaired 2 tags and 0 ingredients', out.getvalue())
+
+    def test_generate_recipes(self):
+        """Test generated data is linked, counted and repeatable"""
+        options = {'users': 2, 'recipes_per_user': 20, 'tags_per_user': 6,
+                   'ingredients_per_user': 15, 'seed': 3,
+                   'stdout': StringIO()}
+
+        def generated():
+            return list(Recipe.objects.order_by(
+                'id', 'tags__name'
+            ).values_list('user__email', 'title', 'price', 'tags__name'))
+
+        call_command('generate_recipes', **options)
+        first = generated()
+        call_command('generate_recipes', replace=True, **options)
+
+        users = get_user_model().objects.filter(email__endswith='@example.com')
+        self.assertEqual(users.count(), 2)
+        self.assertEqual(Recipe.objects.count(), 40)
+        self.assertEqual(Tag.objects.count(), 12)
+        self.assertEqual(generated(), first)
+        self.assertEqual(repair_recipe_counts(Tag, 'tags'), 0)
+        self.assertEqual(repair_recipe_counts(Ingredient, 'ingredients'), 0)
+        self.assertIn('Generated 2 users with 40 recipes',
+                      options['stdout'].getvalue())
+
+    def test_generate_recipes_existing_users(self):
+        """Test generating refuses to add to an earlier run's users"""
+        get_user_model().objects.create_user('sample-0@example.com', 'pass')
+
+        with self.assertRaisesMessage(CommandError, '--replace'):
+            call_command('generate_recipes', users=1, stdout=StringIO())
+
+    def test_generate_recipes_replace_keeps_other_users(self):
+        """Test replacing only deletes users of the generated form"""
+        for email in ('sample-chef@gmail.com', 'sample-1@example.org',
+                      'sample-1-x@example.com'):
+            get_user_model().objects.create_user(email, 'pass')
+
+        call_command('generate_recipes', users=1, recipes_per_user=2,
+                     replace=True, stdout=StringIO())
+        call_command('generate_recipes', users=1, recipes_per_user=2,
+                     replace=True, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(get_user_model().objects.values_list('email', flat=True)),
+            ['sample-0@example.com', 'sample-1-x@example.com',
+             'sample-1@example.org', 'sample-chef@gmail.com']
+        )
+
+    def test_process_pending_images(self):
+        """Test stranded pending images are processed, recent ones left"""
+        user = get_user_model().objects.create_user('test@test.com', 'pass')
+        content = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(content, format='JPEG')
+        stranded, recent = [
+            Recipe.objects.create(user=user, title=title, time_minutes=5,
+                                  price=1, image_status=Recipe.IMAGE_PENDING)
+            for title in ('Stranded', 'Recent')
+        ]
+        for recipe in (stranded, recent):
+            recipe.image.save('photo.jpg', ContentFile(content.getvalue()))
+        self.addCleanup(lambda: [
+            file.delete(save=False) for file in
+            [stranded.image, recent.image] +
+            [rendition.image for rendition in
+             RecipeImageRendition.objects.all()]
+        ])
+        hour_ago = time.time() - 3600
+        os.utime(stranded.image.path, (hour_ago, hour_ago))
+        out = StringIO()
+
+        call_command('process_pending_images', older_than=600, stdout=out)
+
+        stranded.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual(stranded.image_status, Recipe.IMAGE_READY)
+        self.assertTrue(stranded.renditions.exists())
+        self.assertEqual(recent.image_status, Recipe.IMAGE_PENDING)
+        self.assertIn('Processed 1 pending images', out.getvalue())
+
+    def test_benchmark_login(self):
+        """Test the login benchmark reports a rate for each policy"""
+        out = StringIO()
+
+        call_command('benchmark_login', seconds=0.01, stdout=out)
+
+        self.assertIn('argon2: ', out.getvalue())
+        self.assertIn('pbkdf2: ', out.getvalue())
+        self.assertIn('logins/s per core', out.getvalue())
+
+    @override_settings(ALLOWED_HOSTS=['.example.com'])
+    @patch(f'{SERVING}.http.client.HTTPConnection')
+    @patch(f'{SERVING}.Command.server', return_value=nullcontext())
+    def test_benchmark_serving(self, server, connection):
+        """Test the serving benchmark replaces a stale user and sends the
+        requests to a host the app accepts"""
+        get_user_model().objects.create_user('benchmark-serving@example.com')
+        connection.return_value.getresponse.return_value.status = 200
+        out = StringIO()
+
+        call_command('benchmark_serving', mode=['wsgi'], duration=0.01,
+                     concurrency=1, stdout=out)
+
+        headers = connection.return_value.request.call_args[1]['headers']
+        self.assertEqual(headers['Host'], 'example.com')
+        self.assertIn('wsgi: ', out.getvalue())
+        self.assertFalse(get_user_model().objects.filter(
+            email='benchmark-serving@example.com'
+        ).exists())
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    """Test the benchmark commands, which send requests from threads
+
+    The threads open their own connections, so they only see data
+    committed by the test, and what they write is flushed afterwards.
+    """
+
+    def test_benchmark_db_connections(self):
+        """Test the connection benchmark times each mode it can run"""
+        out = StringIO()
+        err = StringIO()
+
+        call_command('benchmark_db_connections', requests=3, threads=2,
+                     stdout=out, stderr=err)
+
+        self.assertIn('fresh: ', out.getvalue())
+        self.assertIn('persistent: ', out.getvalue())
+        self.assertIn('pooled: ', out.getvalue())
+        self.assertIn('requests/s', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+        self.assertFalse(get_user_model().objects.filter(
+            email='benchmark-db-connections@example.com'
+        ).exists())
+
+    def test_benchmark_db_connections_stale_user(self):
+        """Test a user left by an interrupted run is replaced"""
+        get_user_model().objects.create_user(
+            'benchmark-db-connections@example.com'
+        )
+
+        call_command('benchmark_db_connections', requests=1, threads=1,
+                     mode=['fresh'], stdout=StringIO())
+
+        self.assertFalse(get_user_model().objects.filter(
+            email='benchmark-db-connections@example.com'
+        ).exists())
+
+    def test_benchmark_api(self):
+        """Test the API benchmark saves and compares against a baseline"""
+        out = StringIO()
+        options = dict(users=2, recipes=5, tags=3, ingredients=4,
+                       requests=4, concurrency=1, stdout=out)
+        with tempfile.NamedTemporaryFile(suffix='.json') as f:
+            call_command('benchmark_api', baseline=f.name,
+                         save_baseline=True, **options)
+            baseline = json.load(open(f.name))
+
+            self.assertEqual(get_user_model().objects.filter(
+                email__startswith='benchmark-api-'
+            ).count(), 2)
+            self.assertEqual(Recipe.objects.filter(
+                title__startswith='Benchmark '
+            ).count(), 4)
+            for result in baseline['results'].values():
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['requests_per_second'], 0)
+            self.assertIn('recipe-list: ', out.getvalue())
+            self.assertIn('p95', out.getvalue())
+
+            call_command('benchmark_api', baseline=f.name, tolerance=1000,
+                         **options)
+
+        self.assertIn('against the baseline', out.getvalue())
+        self.assertNotIn('Seeded', out.getvalue().split('Saved')[1])
+
+    def _write_baseline(self, f, **changes):
+        json.dump(dict({
+            'options': dict(users=1, recipes=2, tags=2, ingredients=2,
+                            seed=1, requests=2, concurrency=1),
+            'database': connection.vendor,
+            'results': {'tag-list': {
+                'requests_per_second': 1e9, 'p50_ms': 0.0, 'p95_ms': 0.0,
+                'p99_ms': 0.0, 'errors': 0,
+            }},
+        }, **changes), f)
+        f.flush()
+
+    def test_benchmark_api_regression(self):
+        """Test the API benchmark fails when slower than the baseline"""
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            self._write_baseline(f)
+
+            with self.assertRaisesMessage(CommandError, 'tag-list'):
+                call_command('benchmark_api', users=1, recipes=2, tags=2,
+                             ingredients=2, requests=2, concurrency=1,
+                             endpoint=['tag-list'], baseline=f.name,
+                             stdout=StringIO())
+
+    def test_benchmark_api_baseline_settings_differ(self):
+        """Test a baseline saved with other settings is not compared"""
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            self._write_baseline(f, database='oracle')
+
+            with self.assertRaisesMessage(CommandError, 'requests 2 -> 3'):
+                call_command('benchmark_api', users=1, recipes=2, tags=2,
+                             ingredients=2, requests=3, concurrency=1,
+                             endpoint=['tag-list'], baseline=f.name,
+                             stdout=StringIO())
+            with self.assertRaisesMessage(CommandError, 'database oracle'):
+                call_command('benchmark_api', users=1, recipes=2, tags=2,
+                             ingredients=2, requests=2, concurrency=1,
+                             endpoint=['tag-list'], baseline=f.name,
+                             stdout=StringIO())
+
+    def test_benchmark_thread_error_raised(self):
+        """Test an exception in a benchmark thread reaches the caller"""
+        calls = []
+
+        def work(index, count):
+            calls.append(index)
+            if index == 1:
+                raise ValueError('thread failed')
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
+        with BenchmarkConnections() as benchmark:
+            with self.assertRaisesMessage(ValueError, 'thread failed'):
+                benchmark.run(work, [1, 1, 1])
 
-            self.assertEqual(gi.call_count, 6)
+        self.assertEqual(sorted(calls), [0, 1, 2])
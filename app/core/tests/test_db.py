@@ -0,0 +1,58 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the in-process PostgreSQL connection pool"""
+
+    def setUp(self):
+        self.pool = ConnectionPool(connection.get_connection_params(),
+                                   max_size=2, timeout=0.1)
+        self.addCleanup(self.pool.close)
+
+    def test_returned_connection_reused(self):
+        """Test a returned connection is handed out again"""
+        first = self.pool.get()
+        self.pool.put(first)
+
+        self.assertIs(self.pool.get(), first)
+
+    def test_open_transaction_rolled_back(self):
+        """Test work left open is rolled back before reuse"""
+        conn = self.pool.get()
+        with conn.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE pool_check (id int)')
+        self.pool.put(conn)
+
+        conn = self.pool.get()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pool_check')")
+            self.assertIsNone(cursor.fetchone()[0])
+        self.pool.put(conn)
+
+    def test_waits_then_times_out_when_exhausted(self):
+        """Test checking out more than max_size connections fails"""
+        conns = [self.pool.get(), self.pool.get()]
+
+        with self.assertRaises(PoolTimeout):
+            self.pool.get()
+
+        for conn in conns:
+            self.pool.put(conn)
+
+    def test_closed_connection_replaced(self):
+        """Test a connection that died while idle is not handed out"""
+        conn = self.pool.get()
+        self.pool.put(conn)
+        conn.close()
+
+        fresh = self.pool.get(health_check=True)
+
+        self.assertIsNot(fresh, conn)
+        self.assertFalse(fresh.closed)
+        self.pool.put(fresh)
@@ -0,0 +1,96 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.pagination import RecipeAttrCursorPagination
+
+
+PAGE_SIZE = RecipeAttrCursorPagination.page_size
+
+
+class IndexUsageTests(TestCase):
+    """Test the query planner uses the per-user composite indexes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are cheaper to scan than to look up, so
+            # make the planner show which index it would pick. A bitmap
+            # scan of any index on the filtered column can look as cheap,
+            # whatever statistics earlier tests left behind
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_bitmapscan = off')
+
+    def forbidSort(self):
+        """Make the planner read rows in order from an index if it can
+
+        With a handful of rows any index plus a sort looks as cheap, while
+        a real page of a long list is only cheap from the ordered index.
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_sort = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        """Assert the query plan for queryset mentions index_name"""
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_tag_list_uses_user_name_index(self):
+        """Test a page of tags is read in order from the (user, name) index"""
+        self.forbidSort()
+        queryset = Tag.objects.filter(user=self.user).order_by(
+            '-name', '-id'
+        )[:PAGE_SIZE + 1]
+
+        self.assertUsesIndex(queryset, 'core_tag_user_name_idx')
+
+    def test_ingredient_list_uses_user_name_index(self):
+        """Test a page of ingredients is read from the (user, name) index"""
+        self.forbidSort()
+        queryset = Ingredient.objects.filter(
+            user=self.user
+        ).order_by('-name', '-id')[:PAGE_SIZE + 1]
+
+        self.assertUsesIndex(queryset, 'core_ingredient_user_name_idx')
+
+    def test_recipe_list_uses_user_id_index(self):
+        """Test listing recipes uses the (user, id) index"""
+        queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+
+        self.assertUsesIndex(queryset, 'core_recipe_user_id_idx')
+
+    def test_recipe_tag_filter_uses_through_index(self):
+        """Test filtering recipes by tag uses the (tag, recipe) index"""
+        recipe_ids = Recipe.tags.through.objects.filter(
+            tag_id__in=[1, 2]
+        ).values('recipe_id')
+        queryset = Recipe.objects.filter(user=self.user, id__in=recipe_ids)
+
+        self.assertUsesIndex(queryset, 'core_recipe_tags_tag_recipe_idx')
+
+    def test_recipe_ingredient_filter_uses_through_index(self):
+        """Test filtering recipes by ingredient uses its through index"""
+        recipe_ids = Recipe.ingredients.through.objects.filter(
+            ingredient_id__in=[1, 2]
+        ).values('recipe_id')
+        queryset = Recipe.objects.filter(user=self.user, id__in=recipe_ids)
+
+        self.assertUsesIndex(
+            queryset, 'core_recipe_ingredients_ingr_recipe_idx'
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'Postgres only index')
+    def test_tag_prefix_uses_prefix_index(self):
+        """Test a case insensitive name prefix uses the prefix index"""
+        queryset = Tag.objects.filter(user=self.user,
+                                      name__istartswith='chi')
+
+        self.assertUsesIndex(queryset, 'core_tag_name_prefix_idx')
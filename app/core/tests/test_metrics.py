@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Tag
+
+METRICS_URL = reverse('metrics')
+TAGS_URL = reverse('recipe:tag-list')
+TOKEN_URL = reverse('user:token')
+
+
+def sample_value(text, line_start):
+    """Return the value of the sample line starting with line_start"""
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(' ', 1)[1])
+    raise AssertionError(f'No sample starting {line_start}')
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(TestCase):
+    """Test recording and exposing request metrics"""
+
+    def setUp(self):
+        metrics.registry.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client = APIClient()
+
+    def _metrics(self):
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        return res.content.decode()
+
+    def test_records_view_and_action(self):
+        """Test a request is counted under its view and action"""
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'Quick'})
+        text = self._metrics()
+
+        labels = '{view="TagViewSet",action="list"'
+        self.assertEqual(sample_value(
+            text, 'http_request_duration_seconds_count' + labels), 2)
+        self.assertEqual(sample_value(
+            text, 'http_request_queries_bucket' + labels + ',le="+Inf"'), 2)
+        self.assertGreater(sample_value(
+            text, 'http_request_queries_sum' + labels), 0)
+        self.assertGreater(sample_value(
+            text, 'http_response_size_bytes_sum' + labels), 0)
+        self.assertEqual(sample_value(
+            text, 'http_request_duration_seconds_count'
+            '{view="TagViewSet",action="create"}'), 1)
+
+    def test_counts_serializer_time(self):
+        """Test serializer time is recorded for views using serializers"""
+        self.client.post(TOKEN_URL, {'email': 'test@test.com',
+                                     'password': 'testpass'})
+        text = self._metrics()
+
+        self.assertGreater(sample_value(
+            text, 'http_request_serializer_seconds_sum'
+            '{view="CreateTokenView",action="post"}'), 0)
+
+    def test_counts_duplicate_queries(self):
+        """Test repeating a query with the same parameters is counted"""
+        stats = metrics.RequestStats()
+
+        def execute(sql, params, many, context):
+            return None
+
+        stats.record_query(execute, 'SELECT %s', (1,), False, {})
+        stats.record_query(execute, 'SELECT %s', (2,), False, {})
+        stats.record_query(execute, 'SELECT %s', (1,), False, {})
+
+        self.assertEqual(stats.queries, 3)
+        self.assertEqual(stats.duplicate_queries, 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket counts include every smaller observation"""
+        histogram = metrics.Histogram((1, 5))
+
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+
+        self.assertEqual(list(histogram.samples()),
+                         [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual(histogram.sum, 14.5)
+
+    def test_remote_client_refused_without_token(self):
+        """Test only clients on the same host read untokened metrics"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Bearer')
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token_required(self):
+        """Test a configured token is needed, even from the same host"""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5',
+                              HTTP_AUTHORIZATION='Bearer s3cret')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        """Test nothing is recorded or served when metrics are off"""
+        self.client.force_authenticate(self.user)
+
+        self.client.get(TAGS_URL)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('TagViewSet', metrics.registry.render())
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import TestCase
+
+from core.testing import QueryBudgetMixin
+
+
+def count_users(size):
+    """Run one query per user, like an N+1 loop"""
+    for user in get_user_model().objects.all()[:size]:
+        get_user_model().objects.filter(id=user.id).exists()
+    return HttpResponse()
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the query budget assertions"""
+
+    def _seed(self, size):
+        get_user_model().objects.all().delete()
+        for i in range(size):
+            get_user_model().objects.create_user(f'user{i}@test.com')
+        return size
+
+    def test_growing_queries_fail(self):
+        """Test a query count growing with the data fails"""
+        with self.assertRaisesMessage(AssertionError, 'grows with n'):
+            self.assertQueryBudget(10, self._seed, count_users,
+                                   sizes=(1, 3))
+
+    def test_over_budget_fails(self):
+        """Test a fixed query count above the budget fails"""
+        with self.assertRaisesMessage(AssertionError, 'over the budget'):
+            self.assertQueryBudget(1, self._seed, count_users,
+                                   sizes=(2, 2))
+
+    def test_flat_queries_within_budget_pass(self):
+        """Test a fixed query count within the budget passes"""
+        self.assertQueryBudget(2, self._seed, lambda size: count_users(1))
@@ -0,0 +1,143 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.middleware import REPLICA_PIN_COOKIE, ReplicaPinningMiddleware
+from core.models import Tag
+from core.routers import ReplicaRouter, pin_to_primary
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test reads going to a replica while writes stay on the primary
+
+    A second SQLite database stands in for the replica. Nothing is copied
+    to it, so rows only on the primary show which database a read used.
+    Token pins go in a file based cache, which processes can share.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pin_cache_dir = tempfile.mkdtemp()
+        cls.pin_cache = override_settings(
+            CACHES=dict(settings.CACHES, pins={
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cls.pin_cache_dir,
+            }),
+            REPLICA_PIN_CACHE_ALIAS='pins',
+        )
+        cls.pin_cache.enable()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+        connections.ensure_defaults(REPLICA)
+        connections.prepare_test_settings(REPLICA)
+        call_command('migrate', database=REPLICA, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        cls.pin_cache.disable()
+        shutil.rmtree(cls.pin_cache_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['pins'].clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reads_use_replica(self):
+        """Test reads go to the replica when nothing pins them"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_write_pins_client_to_primary(self):
+        """Test a client reads its own writes through the pin cookie"""
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn(REPLICA_PIN_COOKIE, res.cookies)
+        res = self.client.get(TAGS_URL)
+        names = [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['Vegan'])
+
+    def test_write_pins_token_to_primary(self):
+        """Test a token client without cookies reads its own writes"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token abc123')
+
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+        self.client.cookies.clear()
+        res = self.client.get(TAGS_URL)
+
+        names = [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['Vegan'])
+
+        other = APIClient()
+        other.force_authenticate(self.user)
+        other.credentials(HTTP_AUTHORIZATION='Token def456')
+        res = other.get(TAGS_URL)
+        self.assertEqual(res.data['results'], [])
+
+    def test_failed_write_does_not_pin(self):
+        """Test a rejected write leaves the client reading the replica"""
+        res = self.client.post(TAGS_URL, {'name': ''})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(REPLICA_PIN_COOKIE, res.cookies)
+
+    def test_router_keeps_reads_on_primary(self):
+        """Test pinned reads and reads in a transaction use the primary"""
+        router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_read(Tag), REPLICA)
+        with pin_to_primary():
+            self.assertEqual(router.db_for_read(Tag), 'default')
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Tag), 'default')
+        self.assertEqual(router.db_for_write(Tag), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_reads_primary(self):
+        """Test everything uses the primary without replicas"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertNotIn(REPLICA_PIN_COOKIE, res.cookies)
+
+    def test_per_process_pin_cache_rejected(self):
+        """Test a pin cache each process keeps to itself fails at startup"""
+        with override_settings(REPLICA_PIN_CACHE_ALIAS='default'):
+            with self.assertRaisesMessage(ImproperlyConfigured,
+                                          'REPLICA_PIN_CACHE_ALIAS'):
+                ReplicaPinningMiddleware(lambda request: None)
@@ -0,0 +1,92 @@
+import os
+import runpy
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+GUNICORN_CONF = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+
+
+class MediaServingTests(SimpleTestCase):
+    """Test uploaded files are served outside of DEBUG"""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        os.makedirs(os.path.join(self.media_root.name, 'uploads'))
+        with open(os.path.join(self.media_root.name, 'uploads', 'a.jpg'),
+                  'wb') as upload:
+            upload.write(b'image bytes')
+
+    def test_serves_media_with_long_cache(self):
+        """Test a media file is streamed with a long cache lifetime"""
+        with self.settings(MEDIA_ROOT=self.media_root.name):
+            res = self.client.get('/media/uploads/a.jpg')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), b'image bytes')
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+        self.assertIn('public', res['Cache-Control'])
+
+    def test_missing_media_not_found(self):
+        """Test an unknown media path is a 404"""
+        with self.settings(MEDIA_ROOT=self.media_root.name):
+            res = self.client.get('/media/uploads/missing.jpg')
+
+        self.assertEqual(res.status_code, 404)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_media_handed_to_proxy(self):
+        """Test media is passed to the proxy with X-Accel-Redirect"""
+        res = self.client.get('/media/uploads/a.jpg')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Accel-Redirect'],
+                         '/protected-media/uploads/a.jpg')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_proxy_path_cannot_escape(self):
+        """Test paths leading out of the media directory are refused"""
+        res = self.client.get('/media/uploads/../../settings.py')
+
+        self.assertEqual(res.status_code, 404)
+
+
+class ServerConfigTests(SimpleTestCase):
+    """Test the production server entry points and settings"""
+
+    def test_asgi_application(self):
+        """Test the ASGI entry point exposes an application"""
+        from app.asgi import application
+
+        self.assertTrue(callable(application))
+
+    def _config(self, **env):
+        with patch.dict(os.environ, env), \
+                patch('os.sched_getaffinity', return_value={0, 1, 2}):
+            return runpy.run_path(GUNICORN_CONF)
+
+    def test_wsgi_workers_follow_cores(self):
+        """Test WSGI mode runs threaded workers sized to the CPUs"""
+        config = self._config(SERVER_MODE='wsgi')
+
+        self.assertEqual(config['workers'], 7)
+        self.assertEqual(config['worker_class'], 'gthread')
+        self.assertEqual(config['wsgi_app'], 'app.wsgi:application')
+
+    def test_asgi_workers_follow_cores(self):
+        """Test ASGI mode runs one uvicorn worker per CPU"""
+        config = self._config(SERVER_MODE='asgi')
+
+        self.assertEqual(config['workers'], 3)
+        self.assertEqual(config['wsgi_app'], 'app.asgi:application')
+
+    def test_worker_count_override(self):
+        """Test WEB_CONCURRENCY overrides the worker count"""
+        config = self._config(SERVER_MODE='wsgi', WEB_CONCURRENCY='2')
+
+        self.assertEqual(config['workers'], 2)
@@ -0,0 +1,41 @@
+import threading
+
+from django.test import TestCase, override_settings
+
+from core.tasks import LocalTaskQueue, defer
+
+
+class TaskQueueTests(TestCase):
+    """Test running tasks in the background"""
+
+    def test_tasks_run_on_worker_thread(self):
+        """Test queued tasks run on a worker and not the caller"""
+        queue = LocalTaskQueue(workers=1)
+        threads = []
+
+        queue.enqueue(lambda: threads.append(threading.current_thread()))
+        queue.join()
+
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.current_thread())
+
+    def test_failing_task_does_not_stop_worker(self):
+        """Test a task raising an error leaves the worker running"""
+        queue = LocalTaskQueue(workers=1)
+        results = []
+
+        with self.assertLogs('core.tasks', level='ERROR'):
+            queue.enqueue(lambda: 1 / 0)
+            queue.enqueue(results.append, 'done')
+            queue.join()
+
+        self.assertEqual(results, ['done'])
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_defer_eager_runs_inline(self):
+        """Test deferred tasks run straight away in eager mode"""
+        results = []
+
+        defer(results.append, 'done')
+
+        self.assertEqual(results, ['done'])
@@ -0,0 +1,60 @@
+import ipaddress
+import mimetypes
+import posixpath
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.static import serve
+
+from core import metrics
+
+
+def serve_media(request, path):
+    """Serve an uploaded file, or hand it to the front end proxy"""
+    if settings.MEDIA_ACCEL_REDIRECT:
+        path = posixpath.normpath(path).lstrip('/')
+        if path.startswith('..') or not path or path == '.':
+            raise Http404('Media file not found')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + path
+        )
+        content_type = mimetypes.guess_type(path)[0]
+        response['Content-Type'] = content_type or 'application/octet-stream'
+    else:
+        # Streams the file, which WSGI servers send with sendfile
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+
+    if response.status_code == 200:
+        patch_cache_control(response, public=True,
+                            max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+def _metrics_allowed(request):
+    """Whether request may read the metrics"""
+    if settings.METRICS_TOKEN:
+        return constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'
+        )
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return address.is_loopback
+
+
+def metrics_view(request):
+    """Return the request metrics of this process for Prometheus"""
+    if not settings.METRICS_ENABLED:
+        raise Http404('Metrics are turned off')
+    if not _metrics_allowed(request):
+        response = HttpResponse('Metrics need a valid bearer token',
+                                status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(metrics.registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,49 @@
+"""Gunicorn settings for serving the app in production
+
+SERVER_MODE picks the interface: "wsgi" (default) runs threaded sync
+workers, "asgi" runs pure Python uvicorn workers on app.asgi. Worker
+counts follow the CPUs this process may use unless WEB_CONCURRENCY is
+set.
+"""
+
+import os
+
+
+def available_cores():
+    """Return the CPUs this process is allowed to run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+mode = os.environ.get('SERVER_MODE', 'wsgi')
+cores = available_cores()
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+if mode == 'asgi':
+    wsgi_app = 'app.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornH11Worker'
+    workers = int(os.environ.get('WEB_CONCURRENCY', cores))
+else:
+    wsgi_app = 'app.wsgi:application'
+    worker_class = 'gthread'
+    workers = int(os.environ.get('WEB_CONCURRENCY', cores * 2 + 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Lets the app check that caches it relies on are shared by the workers
+os.environ['WEB_WORKERS'] = str(workers)
+
+# Seconds idle keep-alive connections from the proxy are held open
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+# An empty GUNICORN_ACCESS_LOG turns access logging off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F
+
+from recipe.caching import get_version
+
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+class PrefixCache:
+    """In-process LRU of autocomplete results for each name prefix
+
+    Entries are keyed by the user's collection version, so any write
+    leaves the old entries to fall off the end instead of serving them.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_prefix_cache = None
+
+
+def get_prefix_cache():
+    """Return the process wide autocomplete cache"""
+    global _prefix_cache
+    if _prefix_cache is None:
+        _prefix_cache = PrefixCache(settings.AUTOCOMPLETE_CACHE_SIZE)
+    return _prefix_cache
+
+
+def _query(model, user_id, prefix, limit):
+    """Return the most used names starting with prefix from the database"""
+    rows = model.objects.filter(
+        user_id=user_id, name__istartswith=prefix
+    ).order_by('-recipe_count', 'name', 'id').values(
+        'id', 'name', usage=F('recipe_count')
+    )[:limit]
+    return list(rows)
+
+
+def autocomplete(model, user_id, prefix, limit):
+    """Return up to limit of a user's names starting with prefix
+
+    Names are ordered by how many recipes use them. While a user types,
+    each prefix usually extends one already answered: when that answer
+    held every match it is narrowed in memory without a query.
+    """
+    prefix = prefix.lower()
+    version = get_version(user_id)
+    if version[1] is None:
+        return _query(model, user_id, prefix, limit)
+
+    cache = get_prefix_cache()
+
+    def key(text):
+        return (model._meta.label, user_id, version, limit, text)
+
+    cached = cache.get(key(prefix))
+    if cached is not None:
+        return cached[0]
+
+    for end in range(len(prefix) - 1, -1, -1):
+        parent = cache.get(key(prefix[:end]))
+        if parent is not None and parent[1]:
+            results = [row for row in parent[0]
+                       if row['name'].lower().startswith(prefix)]
+            break
+    else:
+        results = _query(model, user_id, prefix, limit)
+
+    cache.set(key(prefix), (results, len(results) < limit))
+    return results
@@ -0,0 +1,260 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, Value, When
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import serializers
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.caching import bump_version
+from recipe.counters import adjust_recipe_counts, count_changes, \
+    link_counts
+from recipe.export import chunked
+from recipe.search import linked_recipe_ids, search_enabled, \
+    update_search_vectors
+from recipe.signals import skip_delete_handlers
+
+
+RELATED_MODELS = (('tags', Tag), ('ingredients', Ingredient))
+RELATED_FIELDS = {model: field for field, model in RELATED_MODELS}
+
+
+def bulk_insert(model, objs):
+    """Insert objs in as few queries as possible and set their ids"""
+    connection = connections[router.db_for_write(model)]
+    if connection.features.can_return_ids_from_bulk_insert:
+        return model.objects.bulk_create(objs)
+    for obj in objs:
+        obj.save(force_insert=True)
+    return objs
+
+
+def update_by_id(model, field, values):
+    """Set field to values[id] on each object, with one UPDATE per batch"""
+    connection = connections[router.db_for_write(model)]
+    model_field = model._meta.get_field(field)
+    batch_size = connection.ops.bulk_batch_size(
+        ['pk', 'pk', field], list(values)
+    ) or len(values)
+    for ids in chunked(values, max(batch_size, 1)):
+        model.objects.filter(id__in=ids).update(**{field: Case(
+            *[When(id=pk, then=Value(values[pk])) for pk in ids],
+            output_field=model_field
+        )})
+
+
+def validate_batch(serializer_class, data, context, partial=False):
+    """Validate a list of items, returning the valid data and the errors
+
+    Errors are a list aligned with data holding an empty dict for every
+    item that validated, the same shape DRF uses for list serializers.
+    """
+    if not isinstance(data, list):
+        raise serializers.ValidationError(
+            {'non_field_errors': [_('Expected a list of items.')]}
+        )
+    if len(data) > settings.BULK_MAX_ITEMS:
+        raise serializers.ValidationError({'non_field_errors': [
+            _('At most {count} items can be sent at once.').format(
+                count=settings.BULK_MAX_ITEMS
+            )
+        ]})
+
+    validated, errors = [], []
+    for item in data:
+        serializer = serializer_class(
+            data=item, partial=partial, context=context
+        )
+        if serializer.is_valid():
+            validated.append(serializer.validated_data)
+            errors.append({})
+        else:
+            validated.append(None)
+            errors.append(serializer.errors)
+    return validated, errors
+
+
+def check_related(user, validated, errors):
+    """Check all referenced tags and ingredients with one query each"""
+    for field, model in RELATED_MODELS:
+        wanted = {
+            pk for item in validated if item for pk in item.get(field, ())
+        }
+        if not wanted:
+            continue
+        found = set(model.objects.filter(
+            user=user, id__in=wanted
+        ).values_list('id', flat=True))
+
+        for item, item_errors in zip(validated, errors):
+            missing = [pk for pk in (item or {}).get(field, ())
+                       if pk not in found]
+            if missing:
+                item_errors[field] = [
+                    _('Invalid pk "{pk_value}" - object does not exist.')
+                    .format(pk_value=pk) for pk in missing
+                ]
+
+
+def check_owned(queryset, validated, errors):
+    """Return the objects named by each item's id, flagging missing ones
+
+    Items repeating an id are flagged too, since applying both could
+    link the same tag or ingredient twice.
+    """
+    seen = Counter(item['id'] for item in validated if item and 'id' in item)
+    objects = queryset.in_bulk(seen)
+
+    for item, item_errors in zip(validated, errors):
+        if item is None:
+            continue
+        if 'id' not in item:
+            item_errors['id'] = [_('This field is required.')]
+        elif item['id'] not in objects:
+            item_errors['id'] = [_('Not found.')]
+        elif seen[item['id']] > 1:
+            item_errors['id'] = [_('Listed more than once.')]
+    return objects
+
+
+def raise_for_errors(errors):
+    """Raise a validation error carrying per-item errors if any failed"""
+    if any(errors):
+        raise serializers.ValidationError(errors)
+
+
+def set_related(recipes, validated):
+    """Replace the tags and ingredients given for each recipe in bulk"""
+    for field, model in RELATED_MODELS:
+        m2m = Recipe._meta.get_field(field)
+        through = m2m.remote_field.through
+        target = f'{m2m.m2m_reverse_field_name()}_id'
+
+        changed = [(recipe, item[field])
+                   for recipe, item in zip(recipes, validated)
+                   if field in item]
+        if not changed:
+            continue
+
+        recipe_ids = [recipe.id for recipe, ids in changed]
+        old = link_counts(field, recipe_ids)
+        through.objects.filter(recipe_id__in=recipe_ids).delete()
+        links = through.objects.bulk_create([
+            through(recipe_id=recipe.id, **{target: pk})
+            for recipe, ids in changed for pk in set(ids)
+        ])
+        new = Counter(getattr(link, target) for link in links)
+        adjust_recipe_counts(model, count_changes(old, new))
+
+
+def create_recipes(user, validated):
+    """Create recipes and their tag and ingredient links"""
+    with transaction.atomic():
+        recipes = bulk_insert(Recipe, [
+            Recipe(user=user, **{
+                key: value for key, value in item.items()
+                if key not in ('id', 'tags', 'ingredients')
+            }) for item in validated
+        ])
+        set_related(recipes, validated)
+        update_search_vectors(recipe.id for recipe in recipes)
+        bump_version(user.id)
+    return recipes
+
+
+def update_recipes(user, objects, validated):
+    """Apply partial updates to recipes and their tags and ingredients"""
+    recipes = []
+    changes = {}
+    for item in validated:
+        recipe = objects[item['id']]
+        for key, value in item.items():
+            if key not in ('id', 'tags', 'ingredients'):
+                setattr(recipe, key, value)
+                changes.setdefault(key, {})[recipe.id] = value
+        recipes.append(recipe)
+
+    with transaction.atomic():
+        for key, values in changes.items():
+            update_by_id(Recipe, key, values)
+        set_related(recipes, validated)
+        update_search_vectors(recipe.id for recipe in recipes)
+        bump_version(user.id)
+    return recipes
+
+
+def create_attrs(model, user, validated):
+    """Create tags or ingredients for a user"""
+    with transaction.atomic():
+        attrs = bulk_insert(model, [
+            model(user=user, name=item['name']) for item in validated
+        ])
+        bump_version(user.id)
+    return attrs
+
+
+def update_attrs(user, objects, validated):
+    """Rename tags or ingredients"""
+    attrs = []
+    names = {}
+    for item in validated:
+        attr = objects[item['id']]
+        if 'name' in item:
+            attr.name = item['name']
+            names[attr.id] = attr.name
+        attrs.append(attr)
+    if not names:
+        return attrs
+
+    model = type(attrs[0])
+    with transaction.atomic():
+        update_by_id(model, 'name', names)
+        if search_enabled():
+            update_search_vectors(
+                linked_recipe_ids(RELATED_FIELDS[model], list(names))
+            )
+        bump_version(user.id)
+    return attrs
+
+
+def delete_batch(user, queryset, data):
+    """Delete the objects listed in data['ids'], returning the count
+
+    Recipe counts, search vectors and the user's version are updated once
+    for the batch instead of by the handlers of every deleted object.
+    """
+    field = serializers.ListField(
+        child=serializers.IntegerField(),
+        max_length=settings.BULK_MAX_ITEMS
+    )
+    try:
+        ids = field.run_validation(
+            data.get('ids') if isinstance(data, dict) else None
+        )
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({'ids': exc.detail})
+
+    model = queryset.model
+    with transaction.atomic():
+        ids = list(queryset.filter(id__in=ids).values_list('id', flat=True))
+        if not ids:
+            return 0
+
+        removed, linked = [], []
+        if model is Recipe:
+            removed = [(attr_model, link_counts(attr_field, ids))
+                       for attr_field, attr_model in RELATED_MODELS]
+        elif search_enabled():
+            linked = linked_recipe_ids(RELATED_FIELDS[model], ids)
+
+        with skip_delete_handlers():
+            deleted, per_model = model.objects.filter(id__in=ids).delete()
+
+        for attr_model, counts in removed:
+            adjust_recipe_counts(attr_model, {
+                pk: -count for pk, count in counts.items()
+            })
+        update_search_vectors(linked)
+        bump_version(user.id, create=False)
+    return per_model.get(model._meta.label, 0)
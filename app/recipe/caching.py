@@ -0,0 +1,117 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import CollectionVersion
+
+
+def bump_version(user_id, create=True):
+    """Mark a user's recipes, tags and ingredients as changed
+
+    Pass create=False from deletions, which may be part of deleting the
+    user, so that no new version row is left pointing at them.
+    """
+    now = timezone.now()
+    updated = CollectionVersion.objects.filter(user_id=user_id).update(
+        version=F('version') + 1, modified=now
+    )
+    if updated or not create:
+        return
+    try:
+        with transaction.atomic():
+            CollectionVersion.objects.create(
+                user_id=user_id, version=1, modified=now
+            )
+    except IntegrityError:
+        bump_version(user_id)
+
+
+def get_version(user_id):
+    """Return (version, modified) for a user, or (0, None) if unchanged"""
+    row = CollectionVersion.objects.filter(user_id=user_id).values_list(
+        'version', 'modified'
+    ).first()
+    return row or (0, None)
+
+
+def _not_modified(request, etag, modified):
+    """Return whether the client's copy matches the current version"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return etag in etags or '*' in etags
+
+    if_modified_since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+    )
+    # Last-Modified only has whole second precision; clients that need to
+    # see writes made within the same second should send If-None-Match
+    return bool(if_modified_since and
+                int(modified.timestamp()) <= if_modified_since)
+
+
+class CachedListMixin:
+    """Serve list responses with ETags and a per-user rendered body cache
+
+    Each response is tagged with the user's collection version. Clients
+    sending a matching If-None-Match or If-Modified-Since get a 304, and
+    JSON bodies are cached under the ETag so repeated polls between writes
+    skip the queries and serialization.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        version, modified = get_version(request.user.id)
+        if modified is None:
+            # Nothing recorded for this user yet, and deletes do not record
+            # anything either, so there is no version that would tell a
+            # stale copy apart: send no validators and never answer 304
+            response = super().list(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Authorization',))
+            return response
+
+        etag = '"{}"'.format(hashlib.sha1('|'.join([
+            str(request.user.id), str(version), modified.isoformat(),
+            request.get_full_path(), request.accepted_media_type,
+        ]).encode()).hexdigest())
+
+        if _not_modified(request, etag, modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self._cached_list(request, etag, *args, **kwargs)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def _cached_list(self, request, etag, *args, **kwargs):
+        """Return the list body from the cache, rendering it on a miss"""
+        cache = caches[settings.RECIPE_CACHE_ALIAS]
+        key = f'recipe-list:{etag}'
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        def store(response):
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, (response.content, response['Content-Type']),
+                          settings.RECIPE_CACHE_TIMEOUT)
+
+        response = super().list(request, *args, **kwargs)
+        response.add_post_render_callback(store)
+        return response
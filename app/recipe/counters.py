@@ -0,0 +1,75 @@
+from collections import Counter
+
+from django.db import connections, router
+from django.db.models import Case, Count, F, IntegerField, OuterRef, \
+    Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from core.models import Recipe
+from recipe.export import chunked
+
+
+def through_for(field):
+    """Return the through model of a recipe M2M and its target column"""
+    m2m = Recipe._meta.get_field(field)
+    return m2m.remote_field.through, f'{m2m.m2m_reverse_field_name()}_id'
+
+
+def link_counts(field, recipe_ids=None, target_ids=None):
+    """Count links from recipes to each tag or ingredient
+
+    Either side can be narrowed to a list of ids; None means any.
+    """
+    through, target = through_for(field)
+    links = through.objects.all()
+    if recipe_ids is not None:
+        links = links.filter(recipe_id__in=recipe_ids)
+    if target_ids is not None:
+        links = links.filter(**{f'{target}__in': target_ids})
+    return Counter(links.values_list(target, flat=True))
+
+
+def count_changes(old, new):
+    """Return the per id difference between two link Counters"""
+    return {pk: new[pk] - old[pk] for pk in set(old) | set(new)}
+
+
+def adjust_recipe_counts(model, deltas):
+    """Add each delta to the recipe_count of the object with that id
+
+    Runs one UPDATE per batch of ids, with the delta of each picked by a
+    CASE. Counts never drop below zero, which links written without the
+    signals, such as by bulk fixtures or raw SQL, could otherwise cause.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    connection = connections[router.db_for_write(model)]
+    batch_size = connection.ops.bulk_batch_size(
+        ['pk', 'pk', 'recipe_count'], list(deltas)
+    ) or len(deltas)
+    for ids in chunked(deltas, max(batch_size, 1)):
+        delta = Case(*[When(id=pk, then=Value(deltas[pk])) for pk in ids],
+                     output_field=IntegerField())
+        model.objects.filter(id__in=ids).update(
+            recipe_count=Greatest(F('recipe_count') + delta, Value(0))
+        )
+
+
+def repair_recipe_counts(model, field):
+    """Reset recipe_count wherever it disagrees with the links
+
+    Returns the number of objects that were corrected.
+    """
+    through, target = through_for(field)
+    actual = Coalesce(Subquery(
+        through.objects.filter(**{target: OuterRef('pk')}).order_by()
+        .values(target).annotate(count=Count('*')).values('count'),
+        output_field=IntegerField()
+    ), Value(0))
+    wrong = model.objects.annotate(actual=actual).exclude(
+        recipe_count=F('actual')
+    ).values_list('id', flat=True)
+    return model.objects.filter(id__in=list(wrong)).update(
+        recipe_count=actual
+    )
@@ -0,0 +1,98 @@
+import csv
+import json
+from itertools import islice
+
+from core.models import Recipe
+
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link', 'tags',
+                 'ingredients')
+
+# Separates tag and ingredient names inside a single CSV cell. Names that
+# hold it, or quotes or line breaks, are quoted as in CSV
+CSV_LIST_SEPARATOR = '|'
+
+
+class Echo:
+    """File-like object that hands back what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _related_names(field, recipe_ids):
+    """Return {recipe_id: [names]} for one M2M field of the given recipes"""
+    m2m = Recipe._meta.get_field(field)
+    target = m2m.m2m_reverse_field_name()
+    links = m2m.remote_field.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by(f'{target}__name', f'{target}_id').values_list(
+        'recipe_id', f'{target}__name'
+    )
+
+    names = {}
+    for recipe_id, name in links:
+        names.setdefault(recipe_id, []).append(name)
+    return names
+
+
+def iter_recipes(queryset, chunk_size):
+    """Yield export rows for queryset, holding one chunk in memory"""
+    rows = queryset.order_by('id').values_list(
+        'id', 'title', 'time_minutes', 'price', 'link'
+    ).iterator(chunk_size=chunk_size)
+
+    for chunk in chunked(rows, chunk_size):
+        ids = [row[0] for row in chunk]
+        tags = _related_names('tags', ids)
+        ingredients = _related_names('ingredients', ids)
+        for recipe_id, title, time_minutes, price, link in chunk:
+            yield {
+                'id': recipe_id,
+                'title': title,
+                'time_minutes': time_minutes,
+                'price': str(price),
+                'link': link,
+                'tags': tags.get(recipe_id, []),
+                'ingredients': ingredients.get(recipe_id, []),
+            }
+
+
+def join_names(names):
+    """Return names as one CSV cell, a line of CSV_LIST_SEPARATOR CSV"""
+    writer = csv.writer(Echo(), delimiter=CSV_LIST_SEPARATOR,
+                        lineterminator='\r\n')
+    # The terminator makes names holding either line break get quoted
+    return writer.writerow(names)[:-2]
+
+
+def stream_ndjson(recipes):
+    """Yield each recipe as one line of JSON"""
+    for recipe in recipes:
+        yield json.dumps(recipe) + '\n'
+
+
+def stream_csv(recipes):
+    """Yield a CSV header followed by one line per recipe"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for recipe in recipes:
+        recipe['tags'] = join_names(recipe['tags'])
+        recipe['ingredients'] = join_names(recipe['ingredients'])
+        yield writer.writerow([recipe[field] for field in EXPORT_FIELDS])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'csv': (stream_csv, 'text/csv'),
+}
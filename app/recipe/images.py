@@ -0,0 +1,172 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from core.models import Recipe, RecipeImageRendition
+from recipe.caching import bump_version
+
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels of each resized copy made from an upload
+RENDITION_SIZES = (
+    ('thumbnail', 150),
+    ('medium', 600),
+    ('large', 1200),
+)
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'WEBP': {'quality': 80, 'method': 4},
+}
+
+# Formats Pillow reads but cannot write, stored as a format it can. An
+# MPO is a JPEG with extra frames, and its first frame is the photo
+WRITE_FORMATS = {'MPO': 'JPEG'}
+
+
+EXIF_ORIENTATION = 0x0112
+
+# How to transpose an image to undo each EXIF orientation
+ORIENTATION_TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+def rendition_formats():
+    """Return the output formats the installed Pillow can encode"""
+    Image.init()
+    return [fmt for fmt in ('JPEG', 'WEBP') if fmt in Image.SAVE]
+
+
+def _write_format(fmt):
+    """Return the format to re-encode an fmt upload as, or None"""
+    Image.init()
+    fmt = WRITE_FORMATS.get(fmt, fmt)
+    return fmt if fmt in Image.SAVE else None
+
+
+def _orientation(img):
+    """Return the EXIF orientation of img, or None if it has none"""
+    # getexif() arrived in Pillow 6, older versions only have _getexif()
+    getexif = getattr(img, 'getexif', None) or getattr(img, '_getexif', None)
+    if getexif is None:
+        return None
+    return (getexif() or {}).get(EXIF_ORIENTATION)
+
+
+def _apply_orientation(img):
+    """Rotate img upright from its EXIF orientation
+
+    Done here rather than with ImageOps.exif_transpose(), which the
+    pinned Pillow does not have, because the EXIF is stripped afterwards
+    and the orientation would otherwise be lost.
+    """
+    method = ORIENTATION_TRANSPOSE.get(_orientation(img))
+    if method is None:
+        return img
+    return img.transpose(method)
+
+
+def _encode(img, fmt):
+    """Encode img without any metadata and return the bytes"""
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **SAVE_OPTIONS.get(fmt, {}))
+    return buffer.getvalue()
+
+
+def _render(img, size, fmt):
+    """Return a copy of img fitted within size and encoded as fmt"""
+    copy = img.copy()
+    copy.thumbnail((size, size), Image.LANCZOS)
+    return copy, _encode(copy, fmt)
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Strip metadata from a recipe image and build its renditions
+
+    Skips the work if the recipe has been given another image since the
+    task was queued, since that upload queues its own task.
+    """
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or recipe.image.name != image_name:
+        return
+
+    renditions = []
+    try:
+        with recipe.image.open('rb') as source:
+            original = Image.open(source)
+            original.load()
+        original_format = original.format
+        upright = _apply_orientation(original)
+        img = upright.convert('RGB')
+
+        stem = os.path.splitext(os.path.basename(image_name))[0]
+        for name, size in RENDITION_SIZES:
+            for fmt in rendition_formats():
+                resized, content = _render(img, size, fmt)
+                rendition = RecipeImageRendition(
+                    recipe=recipe, name=name, format=fmt.lower(),
+                    width=resized.width, height=resized.height
+                )
+                rendition.image.save(
+                    f'{stem}-{name}.{fmt.lower()}', ContentFile(content),
+                    save=False
+                )
+                renditions.append(rendition)
+
+        # Replace the original with a re-encoded copy so location and
+        # camera metadata never leave the server. The copy is saved
+        # under a new name first, so a failed save keeps the upload
+        stored_name = image_name
+        write_format = _write_format(original_format)
+        if write_format is None:
+            logger.warning('Cannot re-encode %s image for recipe %s, '
+                           'keeping it as uploaded', original_format,
+                           recipe_id)
+        else:
+            if write_format != 'JPEG':
+                img = upright
+            stripped = _encode(img, write_format)
+            stored_name = recipe.image.storage.save(image_name,
+                                                    ContentFile(stripped))
+    except (IOError, OSError, SyntaxError, ValueError, KeyError,
+            Image.DecompressionBombError):
+        logger.exception('Could not process image for recipe %s', recipe_id)
+        for rendition in renditions:
+            rendition.image.delete(save=False)
+        failed = Recipe.objects.filter(id=recipe_id, image=image_name) \
+            .update(image_status=Recipe.IMAGE_FAILED)
+        if failed:
+            bump_version(recipe.user_id)
+        return
+
+    with transaction.atomic():
+        updated = Recipe.objects.filter(id=recipe_id, image=image_name) \
+            .update(image=stored_name, image_status=Recipe.IMAGE_READY)
+        if not updated:
+            for rendition in renditions:
+                rendition.image.delete(save=False)
+            if stored_name != image_name:
+                recipe.image.storage.delete(stored_name)
+            return
+        old = list(recipe.renditions.all())
+        RecipeImageRendition.objects.bulk_create(renditions)
+        RecipeImageRendition.objects.filter(
+            id__in=[rendition.id for rendition in old]
+        ).delete()
+        bump_version(recipe.user_id)
+    if stored_name != image_name:
+        recipe.image.storage.delete(image_name)
+    for rendition in old:
+        rendition.image.delete(save=False)
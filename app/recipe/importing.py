@@ -0,0 +1,202 @@
+import csv
+import io
+import json
+import time
+from collections import Counter
+
+from django.db import transaction
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.bulk import bulk_insert
+from recipe.caching import bump_version
+from recipe.counters import adjust_recipe_counts
+from recipe.search import update_search_vectors
+from recipe.export import CSV_LIST_SEPARATOR, chunked
+from recipe.serializers import RecipeImportSerializer
+
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+# Only the first errors are kept so a bad file cannot exhaust memory
+MAX_REPORTED_ERRORS = 100
+
+
+def guess_format(filename):
+    """Return the import format implied by a file name, if any"""
+    ext = filename.rsplit('.', 1)[-1].lower()
+    if ext in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    if ext == 'csv':
+        return 'csv'
+    return None
+
+
+def read_ndjson(lines):
+    """Yield (line number, row) for each non blank line of JSON"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def split_names(value):
+    """Return the names in a list cell written by export.join_names"""
+    reader = csv.reader(io.StringIO(value, newline=''),
+                        delimiter=CSV_LIST_SEPARATOR)
+    return [name for row in reader for name in row if name]
+
+
+def read_csv(lines):
+    """Yield (line number, row) for each CSV record after the header"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        for field in ('tags', 'ingredients'):
+            value = row.get(field) or ''
+            row[field] = split_names(value)
+        yield reader.line_num, row
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+class ImportStats:
+    """Running totals for an import"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.tags_created = 0
+        self.ingredients_created = 0
+        self.errors = []
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed else 0.0
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': self.failed,
+            'tags_created': self.tags_created,
+            'ingredients_created': self.ingredients_created,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors,
+        }
+
+
+class RecipeImporter:
+    """Import recipe rows for a user, a batch at a time
+
+    Tag and ingredient names are resolved through name to id maps that
+    are filled with one query per batch, and names seen for the first
+    time are created with bulk_create. Rows that fail validation are
+    skipped and reported; the rest of the batch is still imported.
+    """
+
+    def __init__(self, user, batch_size=1000, progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.progress = progress
+        self.stats = ImportStats()
+        self.name_ids = {Tag: {}, Ingredient: {}}
+
+    def run(self, fmt, lines):
+        """Import every row read from lines and return the stats"""
+        rows = READERS[fmt](lines)
+        for batch in chunked(rows, self.batch_size):
+            self._import_batch(batch)
+            if self.progress:
+                self.progress(self.stats)
+        return self.stats
+
+    def _validate(self, batch):
+        """Return the validated rows of a batch, recording the rest"""
+        valid = []
+        for line, row in batch:
+            self.stats.rows += 1
+            if not isinstance(row, dict):
+                self.stats.add_error(line, {'non_field_errors': [
+                    'Expected an object.'
+                ]})
+                continue
+            serializer = RecipeImportSerializer(data=row)
+            if serializer.is_valid():
+                valid.append(serializer.validated_data)
+            else:
+                self.stats.add_error(line, serializer.errors)
+        return valid
+
+    def _resolve_names(self, model, names):
+        """Make sure every name has an id, creating missing objects"""
+        known = self.name_ids[model]
+        wanted = set(names) - set(known)
+        if not wanted:
+            return 0
+
+        existing = model.objects.filter(
+            user=self.user, name__in=wanted
+        ).order_by('-id').values_list('name', 'id')
+        known.update(existing)
+
+        missing = sorted(wanted - set(known))
+        created = bulk_insert(model, [
+            model(user=self.user, name=name) for name in missing
+        ])
+        known.update((obj.name, obj.id) for obj in created)
+        return len(created)
+
+    def _import_batch(self, batch):
+        valid = self._validate(batch)
+        if not valid:
+            return
+
+        with transaction.atomic():
+            self.stats.tags_created += self._resolve_names(
+                Tag, (name for row in valid for name in row['tags'])
+            )
+            self.stats.ingredients_created += self._resolve_names(
+                Ingredient,
+                (name for row in valid for name in row['ingredients'])
+            )
+
+            recipes = bulk_insert(Recipe, [
+                Recipe(user=self.user, **{
+                    key: value for key, value in row.items()
+                    if key not in ('tags', 'ingredients')
+                }) for row in valid
+            ])
+
+            for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+                m2m = Recipe._meta.get_field(field)
+                through = m2m.remote_field.through
+                target = f'{m2m.m2m_reverse_field_name()}_id'
+                ids = self.name_ids[model]
+                links = through.objects.bulk_create([
+                    through(recipe_id=recipe.id, **{target: pk})
+                    for recipe, row in zip(recipes, valid)
+                    for pk in {ids[name] for name in row[field]}
+                ])
+                adjust_recipe_counts(model, Counter(
+                    getattr(link, target) for link in links
+                ))
+            update_search_vectors(recipe.id for recipe in recipes)
+            bump_version(self.user.id)
+
+        self.stats.created += len(recipes)
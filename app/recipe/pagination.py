@@ -0,0 +1,135 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, \
+    PageNumberPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination for recipes, newest first"""
+
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Cursor pagination positioned on every ordering field
+
+    DRF only places the cursor on the first ordering field and skips
+    ties with an offset, which stops working past offset_cutoff rows.
+    Here the position holds the whole ordering, which ends in a unique
+    field, so a page always starts right after the last row of the one
+    before without any offset.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*(
+                order[1:] if order.startswith('-') else '-' + order
+                for order in self.ordering
+            ))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(
+                self._after(queryset.model, current_position, reverse)
+            )
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        following_position = None
+        if has_following:
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and \
+                self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _after(self, model, position, reverse):
+        """Return a filter for the rows after position in page order"""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        after = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            # The cursor comes from the client, so check each value suits
+            # its field before it reaches the query
+            if value is None or isinstance(value, (dict, list)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                value = model._meta.get_field(field).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            after |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return after
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = [order.lstrip('-') for order in ordering]
+        if isinstance(instance, dict):
+            values = [instance[field] for field in fields]
+        else:
+            values = [getattr(instance, field) for field in fields]
+        return json.dumps(values, separators=(',', ':'))
+
+
+class RecipeAttrCursorPagination(KeysetCursorPagination):
+    """Keyset pagination for tags and ingredients, by name"""
+
+    ordering = ('-name', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class RecipeAttrPopularCursorPagination(RecipeAttrCursorPagination):
+    """Keyset pagination for tags and ingredients, most used first"""
+
+    ordering = ('-recipe_count', '-id')
+
+
+class RecipeSearchPagination(PageNumberPagination):
+    """Numbered pages for search results, which are ordered by rank"""
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
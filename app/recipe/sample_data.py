@@ -0,0 +1,232 @@
+import random
+import re
+from collections import Counter
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.bulk import update_by_id
+from recipe.caching import bump_version
+from recipe.export import chunked
+from recipe.search import update_search_vectors
+from recipe.signals import skip_delete_handlers
+
+
+STYLES = ('Spicy', 'Creamy', 'Roast', 'Quick', 'Slow cooked', 'Grilled',
+          'Baked', 'Smoky', 'Crispy', 'Fresh', 'Hearty', 'Sticky')
+DISHES = ('chicken curry', 'bean chilli', 'tomato soup', 'beef stew',
+          'noodle salad', 'fish pie', 'mushroom risotto', 'lentil dal',
+          'pork ramen', 'veggie burger', 'lemon tart', 'banana bread')
+TAG_WORDS = ('Dinner', 'Lunch', 'Breakfast', 'Vegan', 'Vegetarian',
+             'Quick', 'Spicy', 'Dessert', 'Budget', 'Family', 'Party',
+             'Healthy', 'Comfort', 'Summer', 'Winter', 'Gluten free')
+INGREDIENT_WORDS = ('Salt', 'Pepper', 'Onion', 'Garlic', 'Rice', 'Flour',
+                    'Butter', 'Egg', 'Milk', 'Chicken', 'Beef', 'Tomato',
+                    'Potato', 'Carrot', 'Lemon', 'Chilli', 'Ginger', 'Oil',
+                    'Sugar', 'Cheese', 'Beans', 'Lentils', 'Spinach')
+
+INSERT_BATCH_SIZE = 2000
+
+# Rows deleted per query, kept under SQLite's limit on query parameters
+DELETE_BATCH_SIZE = 500
+
+
+def sample_names(words, count):
+    """Return count distinct names built from words"""
+    names = list(words[:count])
+    number = 2
+    while len(names) < count:
+        names.extend(f'{word} {number}' for word in words)
+        number += 1
+    return names[:count]
+
+
+def zipf_weights(count, exponent):
+    """Return cumulative Zipf weights for count items ranked by popularity
+
+    The item at rank r is picked in proportion to 1 / r ** exponent, so
+    an exponent of 0 makes every item equally likely.
+    """
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def sample_weighted(rng, ids, cum_weights, count):
+    """Pick count distinct ids, each in proportion to its weight"""
+    if count >= len(ids):
+        return list(ids)
+    picked = []
+    seen = set()
+    while len(picked) < count:
+        for pk in rng.choices(ids, cum_weights=cum_weights,
+                              k=count - len(picked)):
+            if pk not in seen:
+                seen.add(pk)
+                picked.append(pk)
+    return picked
+
+
+def sample_users(email_prefix):
+    """Return the users seed_recipes created with email_prefix
+
+    Only emails of exactly the generated form match, so real accounts
+    that happen to start with the prefix are never picked up.
+    """
+    return get_user_model().objects.filter(
+        email__regex=rf'^{re.escape(email_prefix)}-\d+@example\.com$'
+    )
+
+
+def seed_recipes(email_prefix, users, recipes, tags, ingredients, seed=0,
+                 zipf=1.0, progress=None):
+    """Create users, each with their own recipes, tags and ingredients
+
+    Rows are written with bulk_create and the links straight into the
+    through tables, then recipe counts, search vectors and versions are
+    brought up to date. Tags and ingredients are linked with Zipfian
+    popularity of the given exponent. The same arguments always give the
+    same data. Each user is written in its own transaction and passed to
+    progress, if given, once done. Returns the created users.
+    """
+    rng = random.Random(seed)
+    password = make_password(None)
+    tag_names = sample_names(TAG_WORDS, tags)
+    ingredient_names = sample_names(INGREDIENT_WORDS, ingredients)
+    tag_weights = zipf_weights(tags, zipf)
+    ingredient_weights = zipf_weights(ingredients, zipf)
+
+    emails = [f'{email_prefix}-{i}@example.com' for i in range(users)]
+    _bulk_create(get_user_model(), (
+        get_user_model()(email=email, name=f'Sample user {i}',
+                         password=password)
+        for i, email in enumerate(emails)
+    ))
+    created = list(get_user_model().objects.filter(
+        email__in=emails
+    ).order_by('id'))
+
+    for user in created:
+        with transaction.atomic():
+            tag_ids = _insert_names(Tag, user, tag_names)
+            ingredient_ids = _insert_names(Ingredient, user,
+                                           ingredient_names)
+            _bulk_create(Recipe, (
+                Recipe(user=user, title=f'{rng.choice(STYLES)} '
+                                        f'{rng.choice(DISHES)}',
+                       time_minutes=rng.randint(5, 180),
+                       price=Decimal(rng.randint(100, 5000)) / 100,
+                       link='' if rng.random() < 0.7 else
+                       f'https://example.com/recipes/{i}')
+                for i in range(recipes)
+            ))
+            recipe_ids = list(Recipe.objects.filter(user=user)
+                              .order_by('id').values_list('id', flat=True))
+
+            for field, model, ids, weights, fewest, most in (
+                    ('tags', Tag, tag_ids, tag_weights, 0, 5),
+                    ('ingredients', Ingredient, ingredient_ids,
+                     ingredient_weights, 2, 12)):
+                counts = _insert_links(field, recipe_ids, ids, weights, rng,
+                                       fewest, most)
+                update_by_id(model, 'recipe_count', counts)
+            for ids in chunked(recipe_ids, INSERT_BATCH_SIZE):
+                update_search_vectors(ids)
+            bump_version(user.id)
+        if progress:
+            progress(user, len(recipe_ids))
+    return created
+
+
+def delete_users(users):
+    """Delete users with their recipes, tags and ingredients in bulk
+
+    A plain delete of the users cascades through the handlers that keep
+    recipe counts, search vectors and versions in step, a few queries for
+    every row. Instead the links go straight from the through tables and
+    the other rows a batch at a time without those handlers, then each
+    user's version is bumped once.
+    """
+    user_ids = list(users.values_list('id', flat=True))
+    with transaction.atomic():
+        for batch in chunked(user_ids, DELETE_BATCH_SIZE):
+            for field in ('tags', 'ingredients'):
+                _delete_links(field, batch)
+        with skip_delete_handlers():
+            for model in (Recipe, Tag, Ingredient):
+                rows = model.objects.filter(user__in=users)
+                while True:
+                    ids = list(rows.values_list('id', flat=True)
+                               [:DELETE_BATCH_SIZE])
+                    if not ids:
+                        break
+                    model.objects.filter(id__in=ids).delete()
+        for user_id in user_ids:
+            bump_version(user_id, create=False)
+        users.delete()
+
+
+def _bulk_create(model, objs):
+    """Insert objs a batch at a time, so they are never all in memory"""
+    for batch in chunked(objs, INSERT_BATCH_SIZE):
+        model.objects.bulk_create(batch)
+
+
+def _insert_names(model, user, names):
+    """Create a tag or ingredient for each name, returning their ids"""
+    _bulk_create(model, (model(user=user, name=name) for name in names))
+    return list(model.objects.filter(user=user).order_by('id')
+                .values_list('id', flat=True))
+
+
+def _insert_links(field, recipe_ids, target_ids, cum_weights, rng, fewest,
+                  most):
+    """Link each recipe to between fewest and most weighted random targets
+
+    Rows go into the through table as multi-row INSERTs without building
+    model instances. Returns how many recipes each target was linked to.
+    """
+    m2m = Recipe._meta.get_field(field)
+    through = m2m.remote_field.through
+    columns = ['recipe_id', f'{m2m.m2m_reverse_field_name()}_id']
+    counts = Counter()
+    links = (
+        (recipe_id, pk)
+        for recipe_id in recipe_ids
+        for pk in sample_weighted(rng, target_ids, cum_weights,
+                                  rng.randint(fewest, most))
+    )
+
+    connection = connections[router.db_for_write(through)]
+    qn = connection.ops.quote_name
+    batch_size = max(connection.ops.bulk_batch_size(
+        columns, [None] * INSERT_BATCH_SIZE
+    ), 1)
+    insert = (f'INSERT INTO {qn(through._meta.db_table)} '
+              f'({", ".join(qn(column) for column in columns)}) VALUES ')
+    with connection.cursor() as cursor:
+        for batch in chunked(links, min(batch_size, INSERT_BATCH_SIZE)):
+            counts.update(pk for _, pk in batch)
+            cursor.execute(
+                insert + ', '.join(['(%s, %s)'] * len(batch)),
+                [value for link in batch for value in link]
+            )
+    return counts
+
+
+def _delete_links(field, user_ids):
+    """Delete the through table rows linking the recipes of user_ids"""
+    through = Recipe._meta.get_field(field).remote_field.through
+    connection = connections[router.db_for_write(through)]
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(through._meta.db_table)} WHERE '
+            f'{qn("recipe_id")} IN (SELECT {qn("id")} FROM '
+            f'{qn(Recipe._meta.db_table)} WHERE {qn("user_id")} IN '
+            f'({", ".join(["%s"] * len(user_ids))}))',
+            user_ids
+        )
@@ -0,0 +1,118 @@
+import re
+
+from django.contrib.postgres.search import SearchQueryField, SearchRank
+from django.db import connection
+from django.db.models import Case, F, Func, IntegerField, Q, Value, When
+
+from core.models import Recipe
+
+
+# Text search configuration used to build and query search vectors
+SEARCH_CONFIG = 'english'
+
+# Titles weigh more than tag and ingredient names when ranking
+UPDATE_SEARCH_VECTORS_SQL = """
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, core_recipe.title), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(core_tag.name, ' ')
+        FROM core_tag
+        JOIN core_recipe_tags ON core_recipe_tags.tag_id = core_tag.id
+        WHERE core_recipe_tags.recipe_id = core_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(core_ingredient.name, ' ')
+        FROM core_ingredient
+        JOIN core_recipe_ingredients
+            ON core_recipe_ingredients.ingredient_id = core_ingredient.id
+        WHERE core_recipe_ingredients.recipe_id = core_recipe.id
+    ), '')), 'B')
+WHERE core_recipe.id = ANY(%(ids)s)
+"""
+
+
+class PrefixSearchQuery(Func):
+    """to_tsquery matching every term of a search as a word prefix"""
+
+    function = 'to_tsquery'
+    arg_joiner = '::regconfig, '
+    output_field = SearchQueryField()
+
+    def __init__(self, terms, config=SEARCH_CONFIG):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        super().__init__(Value(config), Value(query))
+
+
+def search_enabled():
+    """Return whether the database maintains recipe search vectors"""
+    return connection.vendor == 'postgresql'
+
+
+def search_terms(text):
+    """Split search text into the words it is made of"""
+    return re.findall(r'\w+', text.lower())
+
+
+def update_search_vectors(recipe_ids):
+    """Rebuild the search vectors of the given recipes"""
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids or not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_SEARCH_VECTORS_SQL, {
+            'config': SEARCH_CONFIG, 'ids': recipe_ids
+        })
+
+
+def linked_recipe_ids(field, ids):
+    """Return the ids of recipes linked to ids through the M2M field"""
+    m2m = Recipe._meta.get_field(field)
+    target = f'{m2m.m2m_reverse_field_name()}_id'
+    return list(m2m.remote_field.through.objects.filter(
+        **{f'{target}__in': ids}
+    ).values_list('recipe_id', flat=True).distinct())
+
+
+def _linked(field, term):
+    """Return recipe ids linked through field to a name containing term"""
+    m2m = Recipe._meta.get_field(field)
+    target = m2m.m2m_reverse_field_name()
+    return m2m.remote_field.through.objects.filter(
+        **{f'{target}__name__icontains': term}
+    ).values('recipe_id')
+
+
+def _fallback_search(queryset, terms):
+    """Match every term against titles, tags and ingredients by substring
+
+    Used where there are no search vectors, such as SQLite in tests.
+    Recipes rank higher for each term found in their title.
+    """
+    rank = Value(0, output_field=IntegerField())
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) |
+            Q(id__in=_linked('tags', term)) |
+            Q(id__in=_linked('ingredients', term))
+        )
+        rank = rank + Case(
+            When(title__icontains=term, then=Value(2)),
+            default=Value(1), output_field=IntegerField()
+        )
+    return queryset.annotate(search_rank=rank)
+
+
+def search_recipes(queryset, text):
+    """Filter queryset to recipes matching text, best matches first"""
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none().order_by('-id')
+
+    if search_enabled():
+        query = PrefixSearchQuery(terms)
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+    else:
+        queryset = _fallback_search(queryset, terms)
+    return queryset.order_by('-search_rank', '-id')
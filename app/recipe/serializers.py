@@ -1,5 +1,6 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from core.models import Tag, Ingredient, Recipe
+from core.models import Tag, Ingredient, Recipe, RecipeImageRendition
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -7,8 +8,8 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = ('id', 'name')
-        read_only_fields = ('id',)
+        fields = ('id', 'name', 'recipe_count')
+        read_only_fields = ('id', 'recipe_count')
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -16,22 +17,77 @@ class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
-        read_only_fields = ('id',)
-
-
-class RecipeSerializer(serializers.ModelSerializer):
+        fields = ('id', 'name', 'recipe_count')
+        read_only_fields = ('id', 'recipe_count')
+
+
+class PrimaryKeyListField(serializers.ManyRelatedField):
+    """List of related primary keys looked up with a single query
+
+    DRF's own field fetches every key on its own, one query per item.
+    """
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(
+            child_relation=serializers.PrimaryKeyRelatedField(
+                queryset=queryset
+            ),
+            **kwargs
+        )
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        keys = []
+        for item in data:
+            try:
+                keys.append((item, pk_field.to_python(item)))
+            except (DjangoValidationError, TypeError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        found = queryset.in_bulk({pk for _, pk in keys})
+        for item, pk in keys:
+            if pk not in found:
+                child.fail('does_not_exist', pk_value=item)
+        return [found[pk] for _, pk in keys]
+
+
+class SparseFieldsMixin:
+    """Serialize only the requested fields, nesting the expanded ones
+
+    fields limits the output to those names, and expand swaps the named
+    related ID lists for the nested objects in expandable.
+    """
+
+    expandable = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.expandable[name](many=True,
+                                                      read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serialize a recipe Object"""
 
-    ingredients = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Ingredient.objects.all()
-    )
+    expandable = {
+        'tags': TagSerializer,
+        'ingredients': IngredientSerializer,
+    }
 
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    ingredients = PrimaryKeyListField(queryset=Ingredient.objects.all())
+
+    tags = PrimaryKeyListField(queryset=Tag.objects.all())
 
     class Meta:
         model = Recipe
@@ -40,17 +96,84 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class RecipeImageRenditionSerializer(serializers.ModelSerializer):
+    """Serializer for resized copies of a recipe image"""
+
+    class Meta:
+        model = RecipeImageRendition
+        fields = ('name', 'format', 'width', 'height', 'image')
+        read_only_fields = fields
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serialize recipe details objects"""
 
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    renditions = RecipeImageRenditionSerializer(many=True, read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'image', 'image_status', 'renditions'
+        )
+        read_only_fields = ('id', 'image', 'image_status')
+
+
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    """Serialize a recipe in a bulk write, keeping related IDs unchecked"""
+
+    id = serializers.IntegerField(required=False)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
+                  'price', 'link')
+
+
+class RecipeImportSerializer(serializers.ModelSerializer):
+    """Serialize a recipe read from an import file"""
+
+    ingredients = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        default=list
+    )
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        default=list
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ('title', 'ingredients', 'tags', 'time_minutes', 'price',
+                  'link')
+
+
+class TagBulkSerializer(TagSerializer):
+    """Serialize a tag in a bulk write"""
+
+    id = serializers.IntegerField(required=False)
+
+
+class IngredientBulkSerializer(IngredientSerializer):
+    """Serialize an ingredient in a bulk write"""
+
+    id = serializers.IntegerField(required=False)
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
 
+    renditions = RecipeImageRenditionSerializer(many=True, read_only=True)
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'renditions')
+        read_only_fields = ('id', 'image_status')
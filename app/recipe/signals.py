@@ -0,0 +1,176 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.caching import bump_version
+from recipe.counters import adjust_recipe_counts, link_counts
+from recipe.search import linked_recipe_ids, search_enabled, \
+    update_search_vectors
+
+
+_state = threading.local()
+
+
+@contextmanager
+def skip_delete_handlers():
+    """Turn off the per object delete handlers inside the block
+
+    For bulk deletes that update counts, search vectors and versions for
+    the whole batch themselves.
+    """
+    _state.skip_delete = True
+    try:
+        yield
+    finally:
+        _state.skip_delete = False
+
+
+def _skipping_delete():
+    return getattr(_state, 'skip_delete', False)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def bump_on_save(sender, instance, raw, **kwargs):
+    """Invalidate cached responses when a recipe, tag or ingredient is saved"""
+    if not raw:
+        bump_version(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_on_delete(sender, instance, **kwargs):
+    """Invalidate cached responses when a recipe, tag or ingredient goes"""
+    if _skipping_delete():
+        return
+    bump_version(instance.user_id, create=False)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_on_link_change(sender, instance, action, **kwargs):
+    """Invalidate cached responses when a recipe's links change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, raw, **kwargs):
+    """Rebuild the search vector of a saved recipe"""
+    if not raw:
+        update_search_vectors([instance.id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def index_renamed_attr(sender, instance, created, raw, **kwargs):
+    """Rebuild the search vectors of recipes using a changed name"""
+    if created or raw or not search_enabled():
+        return
+    field = 'tags' if sender is Tag else 'ingredients'
+    update_search_vectors(linked_recipe_ids(field, [instance.id]))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_linked_recipes(sender, instance, **kwargs):
+    """Note which recipes lose a name before its links are deleted"""
+    if _skipping_delete():
+        return
+    if search_enabled():
+        field = 'tags' if sender is Tag else 'ingredients'
+        instance._linked_recipe_ids = linked_recipe_ids(field, [instance.id])
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def index_deleted_attr(sender, instance, **kwargs):
+    """Rebuild the search vectors of recipes that used a deleted name"""
+    if _skipping_delete():
+        return
+    update_search_vectors(getattr(instance, '_linked_recipe_ids', []))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def index_link_change(sender, instance, action, reverse, model, pk_set,
+                      **kwargs):
+    """Rebuild search vectors when tags or ingredients are linked"""
+    if not search_enabled():
+        return
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_search_vectors([instance.id])
+        return
+
+    # From the tag or ingredient side the recipes are in pk_set, except
+    # for clear which has to look them up before the links go
+    field = 'tags' if sender is Recipe.tags.through else 'ingredients'
+    if action == 'pre_clear':
+        instance._linked_recipe_ids = linked_recipe_ids(field, [instance.id])
+    elif action == 'post_clear':
+        update_search_vectors(getattr(instance, '_linked_recipe_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        update_search_vectors(pk_set)
+
+
+def _attr_field(sender):
+    """Return the recipe field and model linked through sender"""
+    if sender is Recipe.tags.through:
+        return 'tags', Tag
+    return 'ingredients', Ingredient
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_link_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep recipe_count in step as recipes gain and lose links"""
+    field, model = _attr_field(sender)
+    if action == 'post_add':
+        if reverse:
+            adjust_recipe_counts(model, {instance.id: len(pk_set)})
+        else:
+            adjust_recipe_counts(model, {pk: 1 for pk in pk_set})
+    elif action in ('pre_remove', 'pre_clear'):
+        # pk_set on remove may hold ids that were never linked, so count
+        # the links that really exist before they are deleted
+        if action == 'pre_clear':
+            pk_set = None
+        if reverse:
+            removed = link_counts(field, pk_set, [instance.id])
+        else:
+            removed = link_counts(field, [instance.id], pk_set)
+        instance._removed_links = removed
+    elif action in ('post_remove', 'post_clear'):
+        removed = getattr(instance, '_removed_links', {})
+        adjust_recipe_counts(model, {
+            pk: -count for pk, count in removed.items()
+        })
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_recipe_links(sender, instance, **kwargs):
+    """Note a recipe's links before they are deleted with it"""
+    if _skipping_delete():
+        return
+    instance._removed_links = {
+        model: link_counts(field, [instance.id])
+        for field, model in (('tags', Tag), ('ingredients', Ingredient))
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    """Take a deleted recipe off its tags' and ingredients' counts"""
+    if _skipping_delete():
+        return
+    for model, removed in getattr(instance, '_removed_links', {}).items():
+        adjust_recipe_counts(model, {
+            pk: -count for pk, count in removed.items()
+        })
@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Avg, Count, F, Max, Min, Q
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.caching import get_version
+
+
+# Upper bounds of the price bands, the last band has no upper bound
+PRICE_BANDS = (Decimal(5), Decimal(10), Decimal(20), Decimal(50))
+
+CENTS = Decimal('0.01')
+
+
+def _price(value):
+    """Format a price the way RecipeSerializer does, or None"""
+    if value is None:
+        return None
+    return str(Decimal(value).quantize(CENTS))
+
+
+def _minutes(value):
+    return None if value is None else round(float(value), 1)
+
+
+def _query(user_id):
+    """Compute a user's recipe statistics in the database
+
+    Takes one aggregate query over the recipes, with a filtered count for
+    each price band, and one query each for tag and ingredient usage,
+    which is kept on their recipe_count column.
+    """
+    bounds = (None,) + PRICE_BANDS + (None,)
+    bands = list(zip(bounds, bounds[1:]))
+    band_counts = {}
+    for i, (low, high) in enumerate(bands):
+        in_band = Q()
+        if low is not None:
+            in_band &= Q(price__gte=low)
+        if high is not None:
+            in_band &= Q(price__lt=high)
+        band_counts[f'band_{i}'] = Count('id', filter=in_band)
+
+    totals = Recipe.objects.filter(user_id=user_id).aggregate(
+        count=Count('id'),
+        time_avg=Avg('time_minutes'), time_min=Min('time_minutes'),
+        time_max=Max('time_minutes'),
+        price_avg=Avg('price'), price_min=Min('price'),
+        price_max=Max('price'),
+        **band_counts
+    )
+
+    def usage(model):
+        return list(model.objects.filter(user_id=user_id).order_by(
+            '-recipe_count', 'name', 'id'
+        ).values('id', 'name', recipes=F('recipe_count')))
+
+    return {
+        'recipes': totals['count'],
+        'time_minutes': {
+            'average': _minutes(totals['time_avg']),
+            'min': totals['time_min'],
+            'max': totals['time_max'],
+        },
+        'price': {
+            'average': _price(totals['price_avg']),
+            'min': _price(totals['price_min']),
+            'max': _price(totals['price_max']),
+            'distribution': [
+                {'min': _price(low or 0), 'max': _price(high),
+                 'recipes': totals[f'band_{i}']}
+                for i, (low, high) in enumerate(bands)
+            ],
+        },
+        'tags': usage(Tag),
+        'ingredients': usage(Ingredient),
+    }
+
+
+def recipe_stats(user_id):
+    """Return a user's recipe statistics, cached until their next write
+
+    Results are cached under the user's collection version, which every
+    write to their recipes, tags or ingredients bumps.
+    """
+    version, modified = get_version(user_id)
+    if modified is None:
+        return _query(user_id)
+
+    cache = caches[settings.RECIPE_CACHE_ALIAS]
+    key = f'recipe-stats:{user_id}:{version}:{modified.isoformat()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = _query(user_id)
+        cache.set(key, stats, settings.RECIPE_CACHE_TIMEOUT)
+    return stats
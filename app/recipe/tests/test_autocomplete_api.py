@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+
+class AutocompleteAPITests(TestCase):
+    """Test tag and ingredient name autocomplete"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _names(self, url, q, **params):
+        res = self.client.get(url, {'q': q, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [row['name'] for row in res.data]
+
+    def _use(self, attr, times):
+        """Link attr to times new recipes"""
+        field = 'tags' if isinstance(attr, Tag) else 'ingredients'
+        for i in range(times):
+            recipe = Recipe.objects.create(user=self.user, title=f'R{i}',
+                                           time_minutes=1, price=1)
+            getattr(recipe, field).add(attr)
+
+    def test_autocomplete_ordered_by_usage(self):
+        """Test matching names are returned most used first"""
+        chili = Tag.objects.create(user=self.user, name='Chili')
+        chinese = Tag.objects.create(user=self.user, name='Chinese')
+        Tag.objects.create(user=self.user, name='Chicken')
+        Tag.objects.create(user=self.user, name='Dinner')
+        self._use(chili, 1)
+        self._use(chinese, 2)
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'chi'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': chinese.id, 'name': 'Chinese', 'usage': 2},
+            {'id': chili.id, 'name': 'Chili', 'usage': 1},
+            {'id': res.data[2]['id'], 'name': 'Chicken', 'usage': 0},
+        ])
+
+    def test_autocomplete_case_insensitive_and_limited(self):
+        """Test prefixes ignore case and results respect the limit"""
+        for name in ('Salt', 'salted butter', 'Salsa', 'Sugar'):
+            Ingredient.objects.create(user=self.user, name=name)
+
+        names = self._names(INGREDIENTS_AUTOCOMPLETE_URL, 'SAL', limit=2)
+
+        self.assertEqual(names, ['Salsa', 'Salt'])
+
+    def test_autocomplete_limited_to_user(self):
+        """Test other users' names are not suggested"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        Tag.objects.create(user=other, name='Vegan')
+        Tag.objects.create(user=self.user, name='Vegetarian')
+
+        names = self._names(TAGS_AUTOCOMPLETE_URL, 'veg')
+
+        self.assertEqual(names, ['Vegetarian'])
+
+    def test_autocomplete_narrows_cached_prefix(self):
+        """Test typing further narrows a complete answer without a query"""
+        Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Brunch')
+        self._names(TAGS_AUTOCOMPLETE_URL, 'br')
+
+        with CaptureQueriesContext(connection) as queries:
+            names = self._names(TAGS_AUTOCOMPLETE_URL, 'bru')
+
+        self.assertEqual(names, ['Brunch'])
+        self.assertEqual(len(queries), 1)
+
+    def test_autocomplete_sees_writes(self):
+        """Test a new name is suggested straight after it is created"""
+        Tag.objects.create(user=self.user, name='Lunch')
+        self.assertEqual(self._names(TAGS_AUTOCOMPLETE_URL, 'l'), ['Lunch'])
+
+        self.client.post(reverse('recipe:tag-list'), {'name': 'Light'})
+
+        self.assertEqual(self._names(TAGS_AUTOCOMPLETE_URL, 'l'),
+                         ['Light', 'Lunch'])
+
+    def test_autocomplete_invalid_limit(self):
+        """Test a limit outside the allowed range is rejected"""
+        for limit in ('0', '51', 'ten'):
+            res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'limit': limit})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,215 @@
+import io
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CollectionVersion, Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class CachedListAPITests(TestCase):
+    """Test conditional requests and cached list bodies"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(user=self.user, title='Curry',
+                                            time_minutes=30, price=7)
+        self.tag = Tag.objects.create(user=self.user, name='Dinner')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Salt')
+
+    def _etags(self):
+        """Return the current ETag of each list endpoint"""
+        return [self.client.get(url)['ETag']
+                for url in (RECIPES_URL, TAGS_URL, INGREDIENTS_URL)]
+
+    def assertInvalidates(self, write):
+        """Assert that write changes the ETag of every list endpoint"""
+        before = self._etags()
+        write()
+        after = self._etags()
+        for old, new in zip(before, after):
+            self.assertNotEqual(old, new)
+
+    def test_list_has_validators(self):
+        """Test list responses carry ETag and Last-Modified headers"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+        self.assertIn('private', res['Cache-Control'])
+
+    def test_matching_etag_not_modified(self):
+        """Test a matching If-None-Match returns 304 with no body"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_if_modified_since(self):
+        """Test If-Modified-Since returns 304 until the next write"""
+        CollectionVersion.objects.filter(user=self.user).update(
+            modified=timezone.now() - timedelta(hours=1)
+        )
+        modified = self.client.get(TAGS_URL)['Last-Modified']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(TAGS_URL, {'name': 'Lunch'})
+        res = self.client.get(TAGS_URL, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_no_validators_without_version(self):
+        """Test a user with no recorded version is never sent a 304"""
+        CollectionVersion.objects.filter(user=self.user).delete()
+        res = self.client.get(RECIPES_URL)
+        self.assertNotIn('ETag', res)
+        self.assertNotIn('Last-Modified', res)
+
+        self.recipe.delete()
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_cached_body_skips_queries(self):
+        """Test a repeated list is served from the cache"""
+        first = self.client.get(RECIPES_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(json.loads(second.content), first.data)
+        self.assertEqual(len(queries), 1)
+
+    def test_etags_are_per_user_and_query(self):
+        """Test other users and other query strings get their own ETags"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        Recipe.objects.create(user=other, title='Other', time_minutes=1,
+                              price=1)
+
+        self.assertNotEqual(
+            self.client.get(RECIPES_URL, {'tags': self.tag.id})['ETag'], etag
+        )
+        self.client.force_authenticate(other)
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['title'], 'Other')
+
+    def test_other_users_writes_do_not_invalidate(self):
+        """Test a write by another user keeps this user's ETag"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        Tag.objects.create(user=other, name='Other')
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_recipe_writes_invalidate(self):
+        """Test creating, updating and deleting recipes changes the ETag"""
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': 2}
+        self.assertInvalidates(
+            lambda: self.client.post(RECIPES_URL, payload)
+        )
+        self.assertInvalidates(
+            lambda: self.client.patch(detail_url(self.recipe.id),
+                                      {'tags': [self.tag.id]})
+        )
+        self.assertInvalidates(
+            lambda: self.client.put(detail_url(self.recipe.id), payload)
+        )
+        self.assertInvalidates(
+            lambda: self.client.delete(detail_url(self.recipe.id))
+        )
+
+    def test_attr_writes_invalidate(self):
+        """Test creating tags and ingredients changes the ETag"""
+        self.assertInvalidates(
+            lambda: self.client.post(TAGS_URL, {'name': 'Lunch'})
+        )
+        self.assertInvalidates(
+            lambda: self.client.post(INGREDIENTS_URL, {'name': 'Pepper'})
+        )
+
+    def test_link_changes_invalidate(self):
+        """Test adding and removing a recipe's tags changes the ETag"""
+        self.assertInvalidates(lambda: self.recipe.tags.add(self.tag))
+        self.assertInvalidates(lambda: self.recipe.tags.clear())
+
+    def test_bulk_writes_invalidate(self):
+        """Test every bulk endpoint changes the ETag"""
+        recipes_bulk = reverse('recipe:recipe-bulk')
+        tags_bulk = reverse('recipe:tag-bulk')
+        ingredients_bulk = reverse('recipe:ingredient-bulk')
+
+        self.assertInvalidates(lambda: self.client.post(recipes_bulk, [
+            {'title': 'Soup', 'time_minutes': 5, 'price': 2}
+        ], format='json'))
+        self.assertInvalidates(lambda: self.client.patch(recipes_bulk, [
+            {'id': self.recipe.id, 'ingredients': [self.ingredient.id]}
+        ], format='json'))
+        self.assertInvalidates(lambda: self.client.post(tags_bulk, [
+            {'name': 'Lunch'}
+        ], format='json'))
+        self.assertInvalidates(lambda: self.client.patch(ingredients_bulk, [
+            {'id': self.ingredient.id, 'name': 'Sea salt'}
+        ], format='json'))
+        self.assertInvalidates(lambda: self.client.delete(tags_bulk, {
+            'ids': [self.tag.id]
+        }, format='json'))
+        self.assertInvalidates(lambda: self.client.delete(recipes_bulk, {
+            'ids': [self.recipe.id]
+        }, format='json'))
+
+    def test_import_invalidates(self):
+        """Test importing recipes changes the ETag"""
+        upload = io.BytesIO(
+            b'{"title": "Soup", "time_minutes": 5, "price": "2.00"}\n'
+        )
+        upload.name = 'recipes.ndjson'
+
+        self.assertInvalidates(lambda: self.client.post(
+            reverse('recipe:recipe-import-recipes'), {'file': upload},
+            format='multipart'
+        ))
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_image_upload_invalidates(self):
+        """Test uploading and processing an image changes the ETag"""
+        upload = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(upload, format='JPEG')
+        upload.seek(0)
+        upload.name = 'image.jpg'
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+
+        self.assertInvalidates(lambda: self.client.post(
+            url, {'image': upload}, format='multipart'
+        ))
@@ -0,0 +1,188 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.counters import adjust_recipe_counts
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+
+
+class RecipeCountTests(TestCase):
+    """Test tag and ingredient recipe counts stay in step with links"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Dinner')
+        self.other_tag = Tag.objects.create(user=self.user, name='Lunch')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Salt')
+
+    def _recipe(self, title='Curry'):
+        return Recipe.objects.create(user=self.user, title=title,
+                                     time_minutes=5, price=1)
+
+    def assertCounts(self, tag, other_tag, ingredient=0):
+        """Assert the stored recipe counts of the fixture objects"""
+        for obj, expected in ((self.tag, tag), (self.other_tag, other_tag),
+                              (self.ingredient, ingredient)):
+            obj.refresh_from_db()
+            self.assertEqual(obj.recipe_count, expected, obj.name)
+
+    def test_counts_follow_recipe_side_changes(self):
+        """Test adding, removing and clearing a recipe's tags"""
+        recipe = self._recipe()
+
+        recipe.tags.add(self.tag, self.other_tag)
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+        self.assertCounts(1, 1, 1)
+
+        recipe.tags.remove(self.tag, self.tag)
+        recipe.tags.remove(self.tag)
+        self.assertCounts(0, 1, 1)
+
+        recipe.tags.clear()
+        recipe.ingredients.set([])
+        self.assertCounts(0, 0, 0)
+
+    def test_counts_follow_tag_side_changes(self):
+        """Test adding, removing and clearing a tag's recipes"""
+        recipes = [self._recipe(str(i)) for i in range(3)]
+
+        self.tag.recipe_set.add(*recipes)
+        self.assertCounts(3, 0)
+
+        self.tag.recipe_set.remove(recipes[0], self._recipe('Unlinked'))
+        self.assertCounts(2, 0)
+
+        self.tag.recipe_set.clear()
+        self.assertCounts(0, 0)
+
+    def test_deleting_recipe_decrements(self):
+        """Test deleting a recipe takes it off its tags' counts"""
+        recipe = self._recipe()
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+        self._recipe('Other').tags.add(self.tag)
+
+        recipe.delete()
+
+        self.assertCounts(1, 0, 0)
+
+    def test_counts_never_negative(self):
+        """Test links written without signals cannot push counts below 0"""
+        recipe = self._recipe()
+        Recipe.tags.through.objects.create(recipe=recipe, tag=self.tag)
+        other = self._recipe('Other')
+        Recipe.tags.through.objects.create(recipe=other, tag=self.tag)
+
+        recipe.delete()
+        other.tags.clear()
+
+        self.assertCounts(0, 0, 0)
+
+    def test_adjust_counts_in_one_query(self):
+        """Test different deltas for many objects make a single UPDATE"""
+        Tag.objects.filter(id=self.tag.id).update(recipe_count=5)
+
+        with self.assertNumQueries(1):
+            adjust_recipe_counts(Tag, {self.tag.id: -2,
+                                       self.other_tag.id: 3})
+
+        self.assertCounts(3, 3)
+
+    def test_counts_follow_api_writes(self):
+        """Test recipe create, update, bulk and delete keep counts right"""
+        res = self.client.post(reverse('recipe:recipe-list'), {
+            'title': 'Curry', 'time_minutes': 5, 'price': 1,
+            'tags': [self.tag.id], 'ingredients': [self.ingredient.id]
+        }, format='json')
+        recipe_id = res.data['id']
+        self.assertCounts(1, 0, 1)
+
+        res = self.client.post(RECIPES_BULK_URL, [
+            {'title': 'Soup', 'time_minutes': 5, 'price': 1,
+             'tags': [self.tag.id, self.other_tag.id]},
+            {'title': 'Stew', 'time_minutes': 5, 'price': 1,
+             'tags': [self.other_tag.id]},
+        ], format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertCounts(2, 2, 1)
+
+        self.client.patch(RECIPES_BULK_URL, [
+            {'id': recipe_id, 'tags': [self.other_tag.id]},
+        ], format='json')
+        self.assertCounts(1, 3, 1)
+
+        self.client.delete(RECIPES_BULK_URL, {'ids': [recipe_id]},
+                           format='json')
+        self.assertCounts(1, 2, 0)
+
+    def test_import_counts_links(self):
+        """Test imported recipes count towards their tags"""
+        upload = io.BytesIO(
+            b'{"title": "A", "time_minutes": 1, "price": "1", '
+            b'"tags": ["Dinner"]}\n'
+            b'{"title": "B", "time_minutes": 1, "price": "1", '
+            b'"tags": ["Dinner", "Supper"]}\n'
+        )
+        upload.name = 'recipes.ndjson'
+
+        self.client.post(reverse('recipe:recipe-import-recipes'),
+                         {'file': upload}, format='multipart')
+
+        self.assertCounts(2, 0)
+        self.assertEqual(
+            Tag.objects.get(user=self.user, name='Supper').recipe_count, 1
+        )
+
+    def test_popular_sort_pages_through_ties(self):
+        """Test popular pages neither repeat nor skip tags with equal counts"""
+        self._recipe().tags.add(self.other_tag)
+        Tag.objects.bulk_create([
+            Tag(user=self.user, name=f'Spare {i}') for i in range(20)
+        ])
+        expected = list(Tag.objects.filter(user=self.user).order_by(
+            '-recipe_count', '-id'
+        ).values_list('id', flat=True))
+
+        pages = []
+        res = self.client.get(TAGS_URL, {'sort': 'popular', 'page_size': 3})
+        while True:
+            pages.append([tag['id'] for tag in res.data['results']])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(sum(pages, []), expected)
+        res = self.client.get(res.data['previous'])
+        self.assertEqual([tag['id'] for tag in res.data['results']],
+                         pages[-2])
+
+    def test_unused_only_and_popular_sort(self):
+        """Test filtering unused tags and sorting by popularity"""
+        self._recipe().tags.add(self.tag, self.other_tag)
+        self._recipe().tags.add(self.other_tag)
+        spare = Tag.objects.create(user=self.user, name='Spare')
+
+        res = self.client.get(TAGS_URL, {'unused_only': 1})
+        self.assertEqual([t['id'] for t in res.data['results']], [spare.id])
+
+        res = self.client.get(TAGS_URL, {'sort': 'popular'})
+        self.assertEqual([t['id'] for t in res.data['results']],
+                         [self.other_tag.id, self.tag.id, spare.id])
+
+        res = self.client.get(TAGS_URL, {'sort': 'usage'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipes(user, count):
+    """Create count recipes, each with one tag and one ingredient"""
+    tag = Tag.objects.create(user=user, name='Dinner')
+    ingredient = Ingredient.objects.create(user=user, name='Salt')
+    Recipe.objects.bulk_create([
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=i, price=1,
+               link='https://example.com/' + 'x' * 200)
+        for i in range(count)
+    ])
+    recipe_ids = Recipe.objects.filter(user=user).values_list('id',
+                                                              flat=True)
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=pk, tag_id=tag.id)
+        for pk in recipe_ids
+    ])
+    Recipe.ingredients.through.objects.bulk_create([
+        Recipe.ingredients.through(recipe_id=pk, ingredient_id=ingredient.id)
+        for pk in recipe_ids
+    ])
+    # Links written in bulk skip the signals that keep counts in step
+    Tag.objects.filter(id=tag.id).update(recipe_count=count)
+    Ingredient.objects.filter(id=ingredient.id).update(recipe_count=count)
+
+
+class RecipeExportAPITests(TestCase):
+    """Test streaming a user's recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _export(self, **params):
+        """Return the response and full body of an export"""
+        res = self.client.get(EXPORT_URL, params)
+        body = b''.join(res.streaming_content).decode()
+        return res, body
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as newline delimited JSON"""
+        recipe = Recipe.objects.create(user=self.user, title='Curry',
+                                       time_minutes=30, price=7.5)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'),
+            Ingredient.objects.create(user=self.user, name='Chicken')
+        )
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        Recipe.objects.create(user=other, title='Other', time_minutes=1,
+                              price=1)
+
+        res, body = self._export()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = body.splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), {
+            'id': recipe.id,
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '7.50',
+            'link': '',
+            'tags': ['Spicy'],
+            'ingredients': ['Chicken', 'Rice'],
+        })
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV"""
+        recipe = Recipe.objects.create(user=self.user, title='Curry, hot',
+                                       time_minutes=30, price=7)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Spicy'),
+                        Tag.objects.create(user=self.user, name='Dinner'))
+
+        res, body = self._export(output='csv')
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry, hot')
+        self.assertEqual(rows[0]['price'], '7.00')
+        self.assertEqual(rows[0]['tags'], 'Dinner|Spicy')
+        self.assertEqual(rows[0]['ingredients'], '')
+
+    def test_export_csv_quotes_separator(self):
+        """Test names holding the list separator are quoted in their cell"""
+        recipe = Recipe.objects.create(user=self.user, title='Steak',
+                                       time_minutes=30, price=7)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Salt|Pepper'),
+                        Tag.objects.create(user=self.user, name='Dinner'))
+
+        res, body = self._export(output='csv')
+
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(rows[0]['tags'], 'Dinner|"Salt|Pepper"')
+
+    def test_export_invalid_output(self):
+        """Test an unknown export format is a bad request"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(EXPORT_CHUNK_SIZE=50)
+    def test_export_memory_does_not_grow_with_rows(self):
+        """Test peak memory while streaming is flat in the number of rows"""
+
+        def peak_memory(count):
+            Recipe.objects.filter(user=self.user).delete()
+            create_recipes(self.user, count)
+            res = self.client.get(EXPORT_URL)
+            tracemalloc.start()
+            lines = 0
+            for chunk in res.streaming_content:
+                lines += chunk.count(b'\n')
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.assertEqual(lines, count)
+            return peak
+
+        small = peak_memory(100)
+        large = peak_memory(2000)
+
+        self.assertLess(large, small * 2)
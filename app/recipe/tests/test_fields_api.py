@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeFieldsAPITests(TestCase):
+    """Test choosing the fields of recipe responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Salt')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price=5,
+            link='https://example.com/soup'
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def test_list_fields(self):
+        """Test ?fields= returns only those fields from a single query"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'],
+                         [{'id': self.recipe.id, 'title': 'Soup'}])
+        recipe_queries = [query['sql'] for query in queries.captured_queries
+                          if 'core_recipe' in query['sql']]
+        self.assertEqual(len(recipe_queries), 1)
+        self.assertNotIn('"link"', recipe_queries[0])
+
+    def test_list_expand(self):
+        """Test ?expand= nests tags and ingredients in a list"""
+        res = self.client.get(RECIPES_URL, {'expand': 'tags,ingredients'})
+
+        recipe = res.data['results'][0]
+        self.assertEqual(recipe['tags'], [
+            {'id': self.tag.id, 'name': 'Vegan', 'recipe_count': 1}
+        ])
+        self.assertEqual(recipe['ingredients'][0]['name'], 'Salt')
+
+    def test_list_without_params_unchanged(self):
+        """Test lists still return ids of tags and ingredients by default"""
+        res = self.client.get(RECIPES_URL)
+
+        recipe = res.data['results'][0]
+        self.assertEqual(recipe['tags'], [self.tag.id])
+        self.assertEqual(recipe['ingredients'], [self.ingredient.id])
+        self.assertEqual(recipe['link'], 'https://example.com/soup')
+
+    def test_detail_fields(self):
+        """Test ?fields= on a recipe detail skips unrequested relations"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(detail_url(self.recipe.id),
+                                  {'fields': 'title,tags'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data), {'title', 'tags'})
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('core_ingredient', sql)
+        self.assertNotIn('core_recipeimagerendition', sql)
+
+    def test_unknown_field_rejected(self):
+        """Test unknown names in ?fields= or ?expand= return a 400"""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,secret'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', str(res.data['fields']))
+
+        res = self.client.get(RECIPES_URL, {'expand': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fields_ignored_on_write(self):
+        """Test ?fields= does not stop a write from setting other fields"""
+        res = self.client.post(RECIPES_URL + '?fields=id', {
+            'title': 'Stew', 'time_minutes': 5, 'price': 2,
+            'tags': [self.tag.id],
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
@@ -0,0 +1,136 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def ndjson_file(rows, name='recipes.ndjson'):
+    """Return an upload holding rows as newline delimited JSON"""
+    content = ''.join(json.dumps(row) + '\n' for row in rows)
+    return SimpleUploadedFile(name, content.encode())
+
+
+class RecipeImportAPITests(TestCase):
+    """Test importing recipes from files"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_import_ndjson(self):
+        """Test importing recipes resolves tags and ingredients by name"""
+        existing = Tag.objects.create(user=self.user, name='Dinner')
+        upload = ndjson_file([
+            {'title': 'Curry', 'time_minutes': 30, 'price': '7.50',
+             'tags': ['Dinner', 'Spicy'], 'ingredients': ['Rice']},
+            {'title': 'Rice Bowl', 'time_minutes': 10, 'price': '4.00',
+             'tags': ['Dinner', 'Dinner'], 'ingredients': ['Rice']},
+        ])
+
+        res = self.client.post(IMPORT_URL, {'file': upload},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['tags_created'], 1)
+        self.assertEqual(res.data['ingredients_created'], 1)
+        curry = Recipe.objects.get(user=self.user, title='Curry')
+        self.assertEqual(
+            sorted(curry.tags.values_list('name', flat=True)),
+            ['Dinner', 'Spicy']
+        )
+        bowl = Recipe.objects.get(user=self.user, title='Rice Bowl')
+        self.assertEqual(list(bowl.tags.all()), [existing])
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(),
+                         1)
+
+    def test_import_reports_invalid_rows(self):
+        """Test invalid rows are skipped and reported by line"""
+        content = (
+            json.dumps({'title': 'Soup', 'time_minutes': 5, 'price': '1'})
+            + '\nnot json\n'
+            + json.dumps({'title': 'Stew', 'price': '2'}) + '\n'
+        )
+        upload = SimpleUploadedFile('recipes.ndjson', content.encode())
+
+        res = self.client.post(IMPORT_URL, {'file': upload},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['rows'], 3)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual([e['line'] for e in res.data['errors']], [2, 3])
+        self.assertIn('time_minutes', res.data['errors'][1]['errors'])
+
+    def test_import_csv_from_export(self):
+        """Test a CSV export can be imported again"""
+        recipe = Recipe.objects.create(user=self.user, title='Curry',
+                                       time_minutes=30, price=7)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+        exported = b''.join(
+            self.client.get(EXPORT_URL, {'output': 'csv'}).streaming_content
+        )
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        self.client.force_authenticate(other)
+
+        res = self.client.post(
+            IMPORT_URL,
+            {'file': SimpleUploadedFile('recipes.csv', exported)},
+            format='multipart'
+        )
+
+        self.assertEqual(res.data['created'], 1)
+        imported = Recipe.objects.get(user=other)
+        self.assertEqual(imported.title, 'Curry')
+        self.assertEqual(list(imported.tags.values_list('name', flat=True)),
+                         ['Spicy'])
+        self.assertEqual(imported.tags.get().user, other)
+
+    def test_import_csv_separator_in_name(self):
+        """Test a name holding the list separator survives a round trip"""
+        recipe = Recipe.objects.create(user=self.user, title='Steak',
+                                       time_minutes=30, price=7)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Salt|Pepper'),
+                        Tag.objects.create(user=self.user, name='Dinner'))
+        exported = b''.join(
+            self.client.get(EXPORT_URL, {'output': 'csv'}).streaming_content
+        )
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        self.client.force_authenticate(other)
+
+        res = self.client.post(
+            IMPORT_URL,
+            {'file': SimpleUploadedFile('recipes.csv', exported)},
+            format='multipart'
+        )
+
+        self.assertEqual(res.data['created'], 1)
+        imported = Recipe.objects.get(user=other)
+        self.assertEqual(
+            sorted(imported.tags.values_list('name', flat=True)),
+            ['Dinner', 'Salt|Pepper']
+        )
+
+    def test_import_unknown_format(self):
+        """Test a file of unknown format is a bad request"""
+        upload = SimpleUploadedFile('recipes.xml', b'<recipes/>')
+
+        res = self.client.post(IMPORT_URL, {'file': upload},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,108 @@
+import json
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import serializers
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class ValuesListParityTests(TestCase):
+    """Test values() list responses match the serializers byte for byte"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ('Vegan', 'Dessert', 'Quick', 'Ünïcode')]
+        ingredients = [Ingredient.objects.create(user=self.user, name=name)
+                       for name in ('Salt', 'Kale', 'Sugar')]
+        prices = (Decimal('5'), Decimal('5.5'), Decimal('12.34'),
+                  Decimal('0.01'), Decimal('999.99'))
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe "{i}" é',
+                time_minutes=i, price=prices[i % len(prices)],
+                link='' if i % 3 else f'https://example.com/{i}?a=1&b=2'
+            )
+            recipe.tags.set(tags[:i % 5])
+            recipe.ingredients.set(ingredients[i % 2:])
+
+    def _get(self, url, params, fast):
+        """Return the raw body of a list response, bypassing the cache"""
+        caches[settings.RECIPE_CACHE_ALIAS].clear()
+        with override_settings(VALUES_LIST_RESPONSES=fast):
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.content
+
+    def assertParity(self, url, params=None):
+        """Assert both list paths give identical JSON for a request"""
+        expected = self._get(url, params, fast=False)
+        self.assertEqual(self._get(url, params, fast=True), expected)
+        return expected
+
+    def test_recipe_lists_match(self):
+        """Test recipe lists match across filters, fields and searches"""
+        tag = Tag.objects.get(name='Quick')
+        for params in (
+            None,
+            {'page_size': 5},
+            {'fields': 'id,title,price'},
+            {'fields': 'tags,link'},
+            {'tags': tag.id},
+            {'search': 'recipe'},
+            {'search': 'recipe', 'page': 2, 'page_size': 5},
+            {'expand': 'tags'},
+        ):
+            with self.subTest(params=params):
+                self.assertParity(RECIPES_URL, params)
+
+    def test_recipe_cursor_pages_match(self):
+        """Test following the next cursor gives the same pages"""
+        first = json.loads(self.assertParity(RECIPES_URL, {'page_size': 5}))
+        cursor = parse_qs(urlparse(first['next']).query)['cursor'][0]
+
+        self.assertParity(RECIPES_URL, {'page_size': 5, 'cursor': cursor})
+
+    def test_attr_lists_match(self):
+        """Test tag and ingredient lists match for each sort and filter"""
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            for params in (None, {'sort': 'popular'}, {'page_size': 2},
+                           {'assigned_only': 1}, {'unused_only': 1}):
+                with self.subTest(url=url, params=params):
+                    self.assertParity(url, params)
+
+    def test_fast_path_skips_serializers(self):
+        """Test plain lists never serialize model instances"""
+        with mock.patch.object(
+            serializers.RecipeSerializer, 'to_representation',
+            side_effect=AssertionError('serialized an instance')
+        ):
+            self._get(RECIPES_URL, None, fast=True)
+            self._get(RECIPES_URL, {'fields': 'id,tags'}, fast=True)
+
+    def test_expand_uses_serializers(self):
+        """Test nested expansions fall back to the serializers"""
+        res = self.client.get(RECIPES_URL, {'expand': 'ingredients'})
+
+        ingredients = res.data['results'][0]['ingredients']
+        self.assertEqual(set(ingredients[0]), {'id', 'name', 'recipe_count'})
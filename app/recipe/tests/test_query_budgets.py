@@ -0,0 +1,381 @@
+import json
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings, \
+    skipUnlessDBFeature
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from PIL import Image
+
+from core.models import Recipe, Tag, Ingredient
+from core.testing import QueryBudgetMixin
+
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
+STATS_URL = reverse('recipe:recipe-stats')
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
+
+# Most queries each endpoint may run, whatever the size of the data. They
+# were measured on PostgreSQL, which also updates search vectors on writes,
+# so SQLite runs the same number or fewer
+BUDGETS = {
+    'recipe-list': 4,
+    'recipe-search': 5,
+    'recipe-retrieve': 4,
+    'recipe-create': 22,
+    'recipe-update': 20,
+    'recipe-partial-update': 19,
+    'recipe-destroy': 12,
+    'recipe-bulk-create': 21,
+    'recipe-bulk-update': 23,
+    'recipe-bulk-delete': 15,
+    'recipe-export': 3,
+    'recipe-stats': 4,
+    'recipe-import': 16,
+    'recipe-upload-image': 5,
+    'attr-list': 2,
+    'attr-create': 5,
+    'attr-autocomplete': 2,
+    'attr-bulk-create': 7,
+    'attr-bulk-update': 9,
+    'attr-bulk-delete': 8,
+}
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def image_upload_url(recipe_id):
+    """Return url for recipe-upload-image"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+class RecipeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test recipe endpoints run a fixed number of queries"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = 0
+
+    def _client(self):
+        """Return a client logged in as a new user"""
+        self.users += 1
+        user = get_user_model().objects.create_user(
+            f'user{self.users}@test.com',
+            'testpass'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        client.user = user
+        return client
+
+    def _attrs(self, client, size):
+        """Create size tags and ingredients for a client's user"""
+        Tag.objects.bulk_create([
+            Tag(user=client.user, name=f'Tag {i}') for i in range(size)
+        ])
+        Ingredient.objects.bulk_create([
+            Ingredient(user=client.user, name=f'Ingredient {i}')
+            for i in range(size)
+        ])
+        return (list(Tag.objects.filter(user=client.user)),
+                list(Ingredient.objects.filter(user=client.user)))
+
+    def _recipes(self, size, links=2):
+        """Return a client whose user has size linked recipes"""
+        client = self._client()
+        tags, ingredients = self._attrs(client, links)
+        for i in range(size):
+            recipe = Recipe.objects.create(
+                user=client.user, title=f'Recipe {i}', time_minutes=i,
+                price=5
+            )
+            recipe.tags.set(tags)
+            recipe.ingredients.set(ingredients)
+        return client
+
+    def _recipe(self, size):
+        """Return a client and a recipe linked to size tags and ingredients"""
+        client = self._client()
+        tags, ingredients = self._attrs(client, size)
+        recipe = Recipe.objects.create(user=client.user, title='Soup',
+                                       time_minutes=5, price=5)
+        recipe.tags.set(tags)
+        recipe.ingredients.set(ingredients)
+        return client, recipe, tags, ingredients
+
+    def _payload(self, tags, ingredients, title='Stew'):
+        return {
+            'title': title, 'time_minutes': 5, 'price': '5.00',
+            'tags': [tag.id for tag in tags],
+            'ingredients': [ingredient.id for ingredient in ingredients],
+        }
+
+    def test_list(self):
+        """Test listing recipes does not query per recipe"""
+        self.assertQueryBudget(
+            BUDGETS['recipe-list'], self._recipes,
+            lambda client: client.get(RECIPES_URL)
+        )
+
+    def test_search(self):
+        """Test searching recipes does not query per recipe"""
+        self.assertQueryBudget(
+            BUDGETS['recipe-search'], self._recipes,
+            lambda client: client.get(RECIPES_URL, {'search': 'recipe'})
+        )
+
+    def test_stats(self):
+        """Test recipe statistics do not query per recipe or tag"""
+        self.assertQueryBudget(
+            BUDGETS['recipe-stats'], lambda size: self._recipes(size, size),
+            lambda client: client.get(STATS_URL)
+        )
+
+    def test_retrieve(self):
+        """Test a recipe detail does not query per tag or ingredient"""
+        self.assertQueryBudget(
+            BUDGETS['recipe-retrieve'], self._recipe,
+            lambda data: data[0].get(detail_url(data[1].id))
+        )
+
+    def test_create(self):
+        """Test creating a recipe does not query per linked tag"""
+        def seed(size):
+            client = self._client()
+            return client, self._attrs(client, size)
+
+        self.assertQueryBudget(
+            BUDGETS['recipe-create'], seed,
+            lambda data: data[0].post(RECIPES_URL, self._payload(*data[1]),
+                                      format='json')
+        )
+
+    def test_update(self):
+        """Test replacing a recipe does not query per linked tag"""
+        def seed(size):
+            client, recipe, tags, ingredients = self._recipe(size)
+            return client, recipe, self._attrs(client, size)
+
+        self.assertQueryBudget(
+            BUDGETS['recipe-update'], seed,
+            lambda data: data[0].put(detail_url(data[1].id),
+                                     self._payload(*data[2]), format='json')
+        )
+
+    def test_partial_update(self):
+        """Test relinking a recipe does not query per old tag"""
+        def seed(size):
+            client, recipe, tags, ingredients = self._recipe(size)
+            return client, recipe, Tag.objects.create(user=client.user,
+                                                      name='New')
+
+        self.assertQueryBudget(
+            BUDGETS['recipe-partial-update'], seed,
+            lambda data: data[0].patch(detail_url(data[1].id),
+                                       {'tags': [data[2].id]},
+                                       format='json')
+        )
+
+    def test_destroy(self):
+        """Test deleting a recipe does not query per linked tag"""
+        self.assertQueryBudget(
+            BUDGETS['recipe-destroy'], self._recipe,
+            lambda data: data[0].delete(detail_url(data[1].id))
+        )
+
+    # SQLite cannot return ids from a bulk insert, so rows go in one by one
+    @skipUnlessDBFeature('can_return_ids_from_bulk_insert')
+    def test_bulk_create(self):
+        """Test a bulk create does not query per recipe"""
+        def seed(size):
+            client = self._client()
+            tags, ingredients = self._attrs(client, 2)
+            return client, [self._payload(tags, ingredients, f'Stew {i}')
+                            for i in range(size)]
+
+        self.assertQueryBudget(
+            BUDGETS['recipe-bulk-create'], seed,
+            lambda data: data[0].post(RECIPES_BULK_URL, data[1],
+                                      format='json')
+        )
+
+    def test_bulk_update(self):
+        """Test a bulk update does not query per recipe"""
+        def seed(size):
+            client = self._recipes(size)
+            tags, ingredients = self._attrs(client, 2)
+            return client, [
+                dict(self._payload(tags, ingredients), id=recipe.id)
+                for recipe in Recipe.objects.filter(user=client.user)
+            ]
+
+        self.assertQueryBudget(
+            BUDGETS['recipe-bulk-update'], seed,
+            lambda data: data[0].patch(RECIPES_BULK_URL, data[1],
+                                       format='json')
+        )
+
+    def test_bulk_delete(self):
+        """Test a bulk delete does not query per recipe"""
+        def seed(size):
+            client = self._recipes(size)
+            ids = list(Recipe.objects.filter(user=client.user)
+                       .values_list('id', flat=True))
+            return client, ids
+
+        self.assertQueryBudget(
+            BUDGETS['recipe-bulk-delete'], seed,
+            lambda data: data[0].delete(RECIPES_BULK_URL, {'ids': data[1]},
+                                        format='json')
+        )
+
+    def test_export(self):
+        """Test an export does not query per recipe"""
+        def run(client):
+            res = client.get(EXPORT_URL)
+            b''.join(res.streaming_content)
+            return res
+
+        self.assertQueryBudget(BUDGETS['recipe-export'], self._recipes, run)
+
+    # SQLite cannot return ids from a bulk insert, so rows go in one by one
+    @skipUnlessDBFeature('can_return_ids_from_bulk_insert')
+    def test_import(self):
+        """Test an import does not query per row"""
+        def seed(size):
+            rows = [{'title': f'Stew {i}', 'time_minutes': 5,
+                     'price': '5.00', 'tags': ['Dinner', f'Tag {i}'],
+                     'ingredients': ['Rice']} for i in range(size)]
+            content = ''.join(json.dumps(row) + '\n' for row in rows)
+            return self._client(), SimpleUploadedFile('recipes.ndjson',
+                                                      content.encode())
+
+        self.assertQueryBudget(
+            BUDGETS['recipe-import'], seed,
+            lambda data: data[0].post(IMPORT_URL, {'file': data[1]},
+                                      format='multipart')
+        )
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    def test_upload_image(self):
+        """Test uploading an image does not query per linked tag"""
+        def seed(size):
+            data = self._recipe(size)
+            # Deleting the file afterwards queries too, so keep it out of
+            # the request being measured
+            self.addCleanup(self._delete_image, data[1])
+            return data
+
+        def run(data):
+            with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+                Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+                ntf.seek(0)
+                return data[0].post(image_upload_url(data[1].id),
+                                    {'image': ntf}, format='multipart')
+
+        self.assertQueryBudget(BUDGETS['recipe-upload-image'], seed, run)
+
+    def _delete_image(self, recipe):
+        recipe.refresh_from_db()
+        recipe.image.delete()
+
+
+class RecipeAttrQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test tag and ingredient endpoints run a fixed number of queries"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = 0
+
+    def _client(self, model, size):
+        """Return a client whose user has size objects of model"""
+        self.users += 1
+        user = get_user_model().objects.create_user(
+            f'user{self.users}@test.com',
+            'testpass'
+        )
+        model.objects.bulk_create([
+            model(user=user, name=f'Name {i}') for i in range(size)
+        ])
+        client = APIClient()
+        client.force_authenticate(user)
+        client.ids = list(model.objects.filter(user=user)
+                          .values_list('id', flat=True))
+        return client
+
+    def assertAttrBudget(self, budget, request):
+        """Check request(client, url, ids) for tags and ingredients"""
+        for model, name in ((Tag, 'tag'), (Ingredient, 'ingredient')):
+            with self.subTest(model=name):
+                self.assertQueryBudget(
+                    budget, lambda size: self._client(model, size),
+                    lambda client: request(client, name, client.ids)
+                )
+
+    def test_list(self):
+        """Test listing tags and ingredients runs fixed queries"""
+        self.assertAttrBudget(
+            BUDGETS['attr-list'],
+            lambda client, name, ids: client.get(
+                reverse(f'recipe:{name}-list')
+            )
+        )
+
+    def test_create(self):
+        """Test creating a tag or ingredient runs fixed queries"""
+        self.assertAttrBudget(
+            BUDGETS['attr-create'],
+            lambda client, name, ids: client.post(
+                reverse(f'recipe:{name}-list'), {'name': 'New'}
+            )
+        )
+
+    def test_autocomplete(self):
+        """Test autocomplete does not query per name"""
+        self.assertAttrBudget(
+            BUDGETS['attr-autocomplete'],
+            lambda client, name, ids: client.get(
+                reverse(f'recipe:{name}-autocomplete'), {'q': 'na'}
+            )
+        )
+
+    # SQLite cannot return ids from a bulk insert, so rows go in one by one
+    @skipUnlessDBFeature('can_return_ids_from_bulk_insert')
+    def test_bulk_create(self):
+        """Test a bulk create does not query per item"""
+        self.assertAttrBudget(
+            BUDGETS['attr-bulk-create'],
+            lambda client, name, ids: client.post(
+                reverse(f'recipe:{name}-bulk'),
+                [{'name': f'New {i}'} for i in range(len(ids))],
+                format='json'
+            )
+        )
+
+    def test_bulk_update(self):
+        """Test a bulk rename does not query per item"""
+        self.assertAttrBudget(
+            BUDGETS['attr-bulk-update'],
+            lambda client, name, ids: client.patch(
+                reverse(f'recipe:{name}-bulk'),
+                [{'id': pk, 'name': f'Renamed {pk}'} for pk in ids],
+                format='json'
+            )
+        )
+
+    def test_bulk_delete(self):
+        """Test a bulk delete does not query per item"""
+        self.assertAttrBudget(
+            BUDGETS['attr-bulk-delete'],
+            lambda client, name, ids: client.delete(
+                reverse(f'recipe:{name}-bulk'), {'ids': ids}, format='json'
+            )
+        )
@@ -1,18 +1,36 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
+from recipe.images import RENDITION_SIZES, process_recipe_image, \
+    rendition_formats
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
+import io
 import tempfile
 import os
 from PIL import Image
 
 RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+# An empty big-endian TIFF block, enough for Pillow to keep an EXIF segment
+SAMPLE_EXIF = b'Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00'
+# The same with one entry, orientation 6: the camera was turned clockwise
+ROTATED_EXIF = (b'Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x01'
+                b'\x01\x12\x00\x03\x00\x00\x00\x01\x00\x06\x00\x00'
+                b'\x00\x00\x00\x00')
 
 
 def image_upload_url(recipe_id):
@@ -87,7 +105,7 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -104,8 +122,8 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -242,9 +260,9 @@ class PrivateRecipeAPITests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipe_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -266,9 +284,280 @@ class PrivateRecipeAPITests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_filter_recipe_matching_several_tags_returned_once(self):
+        """Test a recipe matching several filter tags is not duplicated"""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name="Vegan")
+        tag2 = sample_tag(user=self.user, name="Quick")
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPES_URL,
+                              {'tags': f'{tag1.id},{tag2.id},{tag1.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_recipe_by_all_ingredients(self):
+        """Test match=all returns recipes containing every ingredient"""
+        ingredient1 = sample_ingredient(user=self.user, name="Eggs")
+        ingredient2 = sample_ingredient(user=self.user, name="Flour")
+        recipe1 = sample_recipe(user=self.user, title="Pancakes")
+        recipe1.ingredients.add(ingredient1, ingredient2)
+        recipe2 = sample_recipe(user=self.user, title="Omelette")
+        recipe2.ingredients.add(ingredient1)
+
+        res = self.client.get(RECIPES_URL, {
+            'ingredients': f'{ingredient1.id},{ingredient2.id}',
+            'match': 'all'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['id'] for recipe in res.data['results']],
+                         [recipe1.id])
+        # Related id lists have no set order
+        self.assertEqual(set(res.data['results'][0]['ingredients']),
+                         {ingredient1.id, ingredient2.id})
+
+    def test_filter_recipe_by_all_tags_and_ingredients(self):
+        """Test match=all applies to tags and ingredients together"""
+        tag = sample_tag(user=self.user, name="Breakfast")
+        ingredient = sample_ingredient(user=self.user, name="Eggs")
+        recipe1 = sample_recipe(user=self.user, title="Omelette")
+        recipe1.tags.add(tag)
+        recipe1.ingredients.add(ingredient)
+        recipe2 = sample_recipe(user=self.user, title="Porridge")
+        recipe2.tags.add(tag)
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{tag.id}',
+            'ingredients': f'{ingredient.id}',
+            'match': 'all'
+        })
+
+        self.assertEqual(res.data['results'],
+                         [RecipeSerializer(recipe1).data])
+
+    def test_filter_recipe_invalid_ids(self):
+        """Test non-integer filter IDs return a bad request"""
+        res = self.client.get(RECIPES_URL, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+    def test_filter_recipe_invalid_match(self):
+        """Test an unknown match mode returns a bad request"""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('match', res.data)
+
+    def _count_queries(self, url):
+        """Return the number of queries run while fetching url"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx)
+
+    def _add_recipes(self, count):
+        """Create recipes that each have their own tag and ingredient"""
+        for i in range(count):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            )
+        return recipe
+
+    def test_list_recipes_query_count_is_constant(self):
+        """Test listing recipes runs the same queries for any size"""
+        self._add_recipes(2)
+        small = self._count_queries(RECIPES_URL)
+
+        self._add_recipes(10)
+        large = self._count_queries(RECIPES_URL)
+
+        self.assertEqual(small, large)
+
+    def test_recipe_detail_query_count_is_constant(self):
+        """Test recipe detail query count ignores related object count"""
+        recipe = self._add_recipes(1)
+        small = self._count_queries(detail_url(recipe.id))
+
+        for i in range(10):
+            recipe.tags.add(sample_tag(user=self.user, name=f'Extra {i}'))
+        large = self._count_queries(detail_url(recipe.id))
+
+        self.assertEqual(small, large)
+
+    def test_recipes_paginated_by_cursor(self):
+        """Test walking the recipe list page by page with cursors"""
+        recipes = [sample_recipe(user=self.user) for i in range(5)]
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_recipe_page_size_is_limited(self):
+        """Test the page size cannot exceed the endpoint maximum"""
+        max_page_size = RecipeCursorPagination.max_page_size
+        Recipe.objects.bulk_create([
+            Recipe(user=self.user, title='Bulk', time_minutes=1, price=1)
+            for i in range(max_page_size + 1)
+        ])
+
+        res = self.client.get(RECIPES_URL, {'page_size': max_page_size * 2})
+
+        self.assertEqual(len(res.data['results']), max_page_size)
+        self.assertIsNotNone(res.data['next'])
+
+
+class RecipeBulkAPITests(TestCase):
+    """Test writing recipes in batches"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_recipes(self):
+        """Test creating several recipes with tags and ingredients"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {'title': 'Soup', 'time_minutes': 20, 'price': '3.50',
+             'tags': [tag.id], 'ingredients': [ingredient.id]},
+            {'title': 'Salad', 'time_minutes': 5, 'price': '2.00'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['title'] for r in res.data], ['Soup', 'Salad'])
+        soup = Recipe.objects.get(id=res.data[0]['id'])
+        self.assertEqual(list(soup.tags.all()), [tag])
+        self.assertEqual(list(soup.ingredients.all()), [ingredient])
+        self.assertEqual(res.data[0], RecipeSerializer(soup).data)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """Test invalid items are reported and nothing is created"""
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        other_tag = sample_tag(user=user2)
+        payload = [
+            {'title': 'Soup', 'time_minutes': 20, 'price': '3.50'},
+            {'title': 'Salad', 'price': '2.00'},
+            {'title': 'Stew', 'time_minutes': 90, 'price': '8.00',
+             'tags': [other_tag.id]},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minutes', res.data[1])
+        self.assertIn('tags', res.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_requires_list(self):
+        """Test a bulk write must send a list"""
+        res = self.client.post(BULK_URL, {'title': 'Soup'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_recipes(self):
+        """Test partially updating several recipes at once"""
+        recipe1 = sample_recipe(user=self.user, title='Soup')
+        recipe1.tags.add(sample_tag(user=self.user))
+        recipe2 = sample_recipe(user=self.user, title='Salad')
+        new_tag = sample_tag(user=self.user, name='Vegan')
+        payload = [
+            {'id': recipe1.id, 'tags': [new_tag.id]},
+            {'id': recipe2.id, 'title': 'Green Salad'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'Soup')
+        self.assertEqual(list(recipe1.tags.all()), [new_tag])
+        self.assertEqual(recipe2.title, 'Green Salad')
+        self.assertEqual(res.data[1]['title'], 'Green Salad')
+
+    def test_bulk_update_other_users_recipe_fails(self):
+        """Test recipes of other users cannot be updated in bulk"""
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        recipe = sample_recipe(user=user2, title='Soup')
+
+        res = self.client.patch(BULK_URL, [{'id': recipe.id, 'title': 'X'}],
+                                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Soup')
+
+    def test_bulk_update_repeated_id_fails(self):
+        """Test a bulk update naming a recipe twice is rejected"""
+        recipe = sample_recipe(user=self.user, title='Soup')
+        tag = sample_tag(user=self.user)
+        payload = [
+            {'id': recipe.id, 'tags': [tag.id]},
+            {'id': recipe.id, 'tags': [tag.id]},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        self.assertIn('id', res.data[1])
+        self.assertEqual(recipe.tags.count(), 0)
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 0)
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting several of the user's recipes at once"""
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        kept = sample_recipe(user=self.user)
+        other = sample_recipe(user=user2)
+
+        res = self.client.delete(
+            BULK_URL, {'ids': [recipe1.id, recipe2.id, other.id]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            set(Recipe.objects.values_list('id', flat=True)),
+            {kept.id, other.id}
+        )
 
 
 class RecipeImageUploadTests(TestCase):
@@ -284,6 +573,8 @@ class RecipeImageUploadTests(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        for rendition in self.recipe.renditions.all():
+            rendition.image.delete()
         self.recipe.image.delete()
 
     def test_upload_image_to_recipe(self):
@@ -309,3 +600,134 @@ class RecipeImageUploadTests(TestCase):
         res = self.client.post(url, {'image': 'not_image'}, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_image_returns_before_processing(self):
+        """Test the upload is accepted and processed in the background"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertEqual(res.data['renditions'], [])
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_upload_image_builds_renditions(self):
+        """Test processing an upload makes resized copies and strips EXIF"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            img = Image.new('RGB', (1600, 800))
+            img.save(ntf, format='JPEG', exif=SAMPLE_EXIF)
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        renditions = {(r.name, r.format): r
+                      for r in self.recipe.renditions.all()}
+        self.assertEqual(len(renditions),
+                         len(RENDITION_SIZES) * len(rendition_formats()))
+        thumbnail = renditions[('thumbnail', 'jpeg')]
+        self.assertEqual((thumbnail.width, thumbnail.height), (150, 75))
+        for rendition in renditions.values():
+            self.assertTrue(os.path.exists(rendition.image.path))
+        with Image.open(self.recipe.image.path) as stored:
+            self.assertNotIn('exif', stored.info)
+        self.assertEqual(len(res.data['renditions']), len(renditions))
+
+    def test_process_image_applies_orientation(self):
+        """Test a rotated photo is stored upright once EXIF is stripped"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20)).save(buffer, format='JPEG',
+                                        exif=ROTATED_EXIF)
+        self.recipe.image.save('photo.jpg', ContentFile(buffer.getvalue()))
+
+        process_recipe_image(self.recipe.id, self.recipe.image.name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        with Image.open(self.recipe.image.path) as stored:
+            self.assertEqual(stored.size, (20, 40))
+            self.assertNotIn('exif', stored.info)
+        large = self.recipe.renditions.filter(name='large').first()
+        self.assertEqual((large.width, large.height), (20, 40))
+
+    def test_process_invalid_image_marks_failed(self):
+        """Test an image that cannot be decoded is marked as failed"""
+        self.recipe.image.save('bad.jpg', ContentFile(b'not an image'))
+
+        with self.assertLogs('recipe.images', level='ERROR'):
+            process_recipe_image(self.recipe.id, self.recipe.image.name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertFalse(self.recipe.renditions.exists())
+
+    def _save_image(self, name, fmt, size=(40, 20)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size).save(buffer, format=fmt)
+        self.recipe.image.save(name, ContentFile(buffer.getvalue()))
+
+    @patch('PIL.Image.MAX_IMAGE_PIXELS', 100)
+    def test_process_decompression_bomb_marks_failed(self):
+        """Test an image too large to decode safely is marked as failed"""
+        self._save_image('bomb.jpg', 'JPEG')
+
+        with self.assertLogs('recipe.images', level='ERROR'):
+            process_recipe_image(self.recipe.id, self.recipe.image.name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_process_failed_save_keeps_upload(self):
+        """Test the upload survives when its stripped copy cannot be saved"""
+        self._save_image('photo.jpg', 'JPEG')
+        original = self.recipe.image.name
+        save = FileSystemStorage.save
+
+        def fail_original(storage, name, *args, **kwargs):
+            if name == original:
+                raise OSError('Disk full')
+            return save(storage, name, *args, **kwargs)
+
+        with patch.object(FileSystemStorage, 'save', fail_original), \
+                self.assertLogs('recipe.images', level='ERROR'):
+            process_recipe_image(self.recipe.id, original)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertEqual(self.recipe.image.name, original)
+        self.assertTrue(self.recipe.image.storage.exists(original))
+
+    def test_process_replaces_original(self):
+        """Test the stripped copy takes the place of the upload"""
+        self._save_image('photo.jpg', 'JPEG')
+        original = self.recipe.image.name
+
+        process_recipe_image(self.recipe.id, original)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertNotEqual(self.recipe.image.name, original)
+        self.assertFalse(self.recipe.image.storage.exists(original))
+        self.assertTrue(self.recipe.image.storage.exists(
+            self.recipe.image.name
+        ))
+
+    def test_process_unwritable_format_kept(self):
+        """Test an upload Pillow cannot write back is kept as uploaded"""
+        self._save_image('photo.png', 'PNG')
+        original = self.recipe.image.name
+        Image.init()
+
+        with patch.dict(Image.SAVE), \
+                self.assertLogs('recipe.images', level='WARNING'):
+            del Image.SAVE['PNG']
+            process_recipe_image(self.recipe.id, original)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(self.recipe.image.name, original)
+        self.assertTrue(self.recipe.renditions.exists())
@@ -0,0 +1,79 @@
+import random
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Tag, Recipe
+from recipe.sample_data import delete_users, sample_names, \
+    sample_users, sample_weighted, seed_recipes, zipf_weights
+
+
+class SampleDataTests(SimpleTestCase):
+
+    def test_sample_names_distinct(self):
+        """Test more names than words are numbered to stay distinct"""
+        names = sample_names(('Salt', 'Pepper'), 5)
+
+        self.assertEqual(names, ['Salt', 'Pepper', 'Salt 2', 'Pepper 2',
+                                 'Salt 3'])
+
+    def test_sample_weighted_distinct(self):
+        """Test weighted samples never repeat an id"""
+        rng = random.Random(0)
+        ids = list(range(10))
+        weights = zipf_weights(10, 2.0)
+
+        for _ in range(100):
+            picked = sample_weighted(rng, ids, weights, 6)
+            self.assertEqual(len(set(picked)), 6)
+        self.assertEqual(sample_weighted(rng, ids, weights, 20), ids)
+
+    def test_zipf_popularity(self):
+        """Test top ranked ids are picked most, and 0 is uniform"""
+        rng = random.Random(0)
+        ids = list(range(50))
+        skewed = Counter(pk for _ in range(2000) for pk in sample_weighted(
+            rng, ids, zipf_weights(50, 1.0), 3
+        ))
+        uniform = Counter(pk for _ in range(2000) for pk in sample_weighted(
+            rng, ids, zipf_weights(50, 0), 3
+        ))
+
+        self.assertGreater(skewed[0], 5 * skewed[49])
+        self.assertLess(uniform[0], 2 * uniform[49])
+
+
+class DeleteUsersTests(TestCase):
+
+    def _delete_queries(self, recipes):
+        """Return the queries deleting a user with recipes recipes"""
+        seed_recipes('sample', 1, recipes, 4, 6)
+        users = sample_users('sample')
+        with CaptureQueriesContext(connection) as queries:
+            delete_users(users)
+        return len(queries)
+
+    def test_delete_users_does_not_query_per_row(self):
+        """Test deleting users takes the same queries for more recipes"""
+        self.assertEqual(self._delete_queries(3), self._delete_queries(30))
+
+    def test_delete_users_leaves_others(self):
+        """Test only the given users and their data are deleted"""
+        seed_recipes('keep', 1, 5, 2, 3)
+        seed_recipes('sample', 1, 5, 2, 3)
+
+        delete_users(sample_users('sample'))
+
+        self.assertEqual(
+            list(get_user_model().objects.values_list('email', flat=True)),
+            ['keep-0@example.com']
+        )
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertEqual(Recipe.tags.through.objects.count(),
+                         Recipe.tags.through.objects.filter(
+                             recipe__user__email='keep-0@example.com'
+                         ).count())
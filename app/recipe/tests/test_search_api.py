@@ -0,0 +1,124 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, title, tags=(), ingredients=()):
+    """Create a recipe linked to new tags and ingredients by name"""
+    recipe = Recipe.objects.create(user=user, title=title, time_minutes=10,
+                                   price=5)
+    for name in tags:
+        recipe.tags.add(Tag.objects.create(user=user, name=name))
+    for name in ingredients:
+        recipe.ingredients.add(Ingredient.objects.create(user=user,
+                                                         name=name))
+    return recipe
+
+
+class RecipeSearchAPITests(TestCase):
+    """Test searching a user's recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _search(self, text, **params):
+        """Return the ids of the recipes found for text, in order"""
+        res = self.client.get(RECIPES_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_search_titles_tags_and_ingredients(self):
+        """Test a search matches titles, tag names and ingredient names"""
+        by_title = create_recipe(self.user, 'Chicken curry')
+        by_tag = create_recipe(self.user, 'Korma', tags=['Curry night'])
+        by_ingredient = create_recipe(self.user, 'Stew',
+                                      ingredients=['Curry powder'])
+        create_recipe(self.user, 'Porridge', tags=['Breakfast'])
+
+        found = self._search('curry')
+
+        self.assertCountEqual(found,
+                              [by_title.id, by_tag.id, by_ingredient.id])
+
+    def test_search_requires_every_term(self):
+        """Test a recipe must match every word of the search"""
+        both = create_recipe(self.user, 'Chicken curry')
+        create_recipe(self.user, 'Chicken soup')
+        create_recipe(self.user, 'Lamb curry')
+
+        self.assertEqual(self._search('chicken curry'), [both.id])
+
+    def test_search_matches_prefixes(self):
+        """Test partial words match, for search as you type"""
+        recipe = create_recipe(self.user, 'Thai green curry',
+                               ingredients=['Chicken thighs'])
+
+        self.assertEqual(self._search('chick gree'), [recipe.id])
+
+    def test_search_ranks_titles_first(self):
+        """Test title matches rank above tag and ingredient matches"""
+        by_ingredient = create_recipe(self.user, 'Biryani',
+                                      ingredients=['Chicken'])
+        by_title = create_recipe(self.user, 'Roast chicken')
+
+        self.assertEqual(self._search('chicken'),
+                         [by_title.id, by_ingredient.id])
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes are never found"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        create_recipe(other, 'Chicken curry')
+
+        self.assertEqual(self._search('chicken'), [])
+
+    def test_search_without_words(self):
+        """Test a search with no words in it finds nothing"""
+        create_recipe(self.user, 'Chicken curry')
+
+        self.assertEqual(self._search('!!'), [])
+
+    def test_search_combines_with_filters_and_pages(self):
+        """Test search works with tag filters and numbered pages"""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        for i in range(3):
+            create_recipe(self.user, f'Curry {i}').tags.add(tag)
+        create_recipe(self.user, 'Curry lunch')
+
+        res = self.client.get(RECIPES_URL, {
+            'search': 'curry', 'tags': tag.id, 'page_size': 2
+        })
+
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+        res = self.client.get(res.data['next'])
+        self.assertEqual(len(res.data['results']), 1)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs search vectors')
+    def test_search_vectors_follow_renames(self):
+        """Test renaming or unlinking a tag updates what is found"""
+        recipe = create_recipe(self.user, 'Stew', tags=['Winter'])
+        tag = recipe.tags.get()
+
+        tag.name = 'Summer'
+        tag.save()
+        self.assertEqual(self._search('summer'), [recipe.id])
+        self.assertEqual(self._search('winter'), [])
+
+        tag.recipe_set.clear()
+        self.assertEqual(self._search('summer'), [])
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+class StatsAPITests(TestCase):
+    """Test the recipe statistics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _recipe(self, time_minutes, price, tags=(), ingredients=()):
+        recipe = Recipe.objects.create(user=self.user, title='Curry',
+                                       time_minutes=time_minutes,
+                                       price=price)
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def test_stats_login_required(self):
+        """Test stats are only served to authenticated users"""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats(self):
+        """Test averages, price bands and usage counts are computed"""
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self._recipe(10, '4.50', [dinner], [salt])
+        self._recipe(20, '5.00', [dinner, vegan], [salt])
+        self._recipe(45, '60.00', [dinner])
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        Recipe.objects.create(user=other, title='Stew', time_minutes=500,
+                              price=90)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 3)
+        self.assertEqual(res.data['time_minutes'],
+                         {'average': 25.0, 'min': 10, 'max': 45})
+        price = res.data['price']
+        self.assertEqual(price['average'], '23.17')
+        self.assertEqual((price['min'], price['max']), ('4.50', '60.00'))
+        self.assertEqual(price['distribution'], [
+            {'min': '0.00', 'max': '5.00', 'recipes': 1},
+            {'min': '5.00', 'max': '10.00', 'recipes': 1},
+            {'min': '10.00', 'max': '20.00', 'recipes': 0},
+            {'min': '20.00', 'max': '50.00', 'recipes': 0},
+            {'min': '50.00', 'max': None, 'recipes': 1},
+        ])
+        self.assertEqual(res.data['tags'], [
+            {'id': dinner.id, 'name': 'Dinner', 'recipes': 3},
+            {'id': vegan.id, 'name': 'Vegan', 'recipes': 1},
+        ])
+        self.assertEqual(res.data['ingredients'], [
+            {'id': salt.id, 'name': 'Salt', 'recipes': 2},
+        ])
+
+    def test_stats_empty(self):
+        """Test a user without recipes gets empty statistics"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 0)
+        self.assertIsNone(res.data['time_minutes']['average'])
+        self.assertIsNone(res.data['price']['average'])
+        self.assertEqual(res.data['tags'], [])
+
+    def test_stats_cached_until_write(self):
+        """Test repeated requests skip the aggregates until a write"""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        self._recipe(10, 5, [tag])
+        self.client.get(STATS_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipes'], 1)
+        self.assertFalse(any('AVG' in query['sql'].upper()
+                             for query in queries.captured_queries))
+
+        self.client.post(reverse('recipe:recipe-list'), {
+            'title': 'Soup', 'time_minutes': 30, 'price': '5.00',
+            'tags': [tag.id],
+        })
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipes'], 2)
+        self.assertEqual(res.data['time_minutes']['average'], 20.0)
+        self.assertEqual(res.data['tags'][0]['recipes'], 2)
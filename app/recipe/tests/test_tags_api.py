@@ -1,3 +1,7 @@
+import base64
+import json
+from urllib.parse import urlencode
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
@@ -10,6 +14,7 @@ from core.models import Tag, Recipe
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
 
 
 class PublicTagsAPITests(TestCase):
@@ -49,7 +54,7 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test that the tags are limited to the user logged in"""
@@ -65,8 +70,8 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_create_tag_successful(self):
         """Test creating a new tag"""
@@ -99,8 +104,80 @@ class PrivateTagsAPITests(TestCase):
         recipe.tags.add(tag1)
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        tag1.refresh_from_db()
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
+
+    def test_tags_paginated_by_cursor(self):
+        """Test walking the tag list by cursor keeps name order"""
+        for name in ('Apple', 'Banana', 'Cherry', 'Banana', 'Date'):
+            Tag.objects.create(user=self.user, name=name)
+
+        names = []
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            names.extend(tag['name'] for tag in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            names, ['Date', 'Cherry', 'Banana', 'Banana', 'Apple']
+        )
+
+    def test_tags_bad_cursor_not_found(self):
+        """Test a cursor with values of the wrong type is rejected"""
+        Tag.objects.create(user=self.user, name='Apple')
+
+        for position in (['a', {'x': 1}], ['a', 'b'], [None, 1], ['a']):
+            cursor = base64.b64encode(urlencode({
+                'p': json.dumps(position)
+            }).encode()).decode()
+            res = self.client.get(TAGS_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_create_tags(self):
+        """Test creating several tags at once"""
+        payload = [{'name': 'Vegan'}, {'name': 'Quick'}]
+
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([tag['name'] for tag in res.data],
+                         ['Vegan', 'Quick'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_tags_invalid(self):
+        """Test invalid tags are reported per item"""
+        payload = [{'name': 'Vegan'}, {'name': ''}]
+
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('name', res.data[1])
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_rename_and_delete_tags(self):
+        """Test renaming and deleting several tags at once"""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+
+        res = self.client.patch(TAGS_BULK_URL,
+                                [{'id': tag1.id, 'name': 'Plant Based'}],
+                                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tag1.refresh_from_db()
+        self.assertEqual(tag1.name, 'Plant Based')
+
+        res = self.client.delete(TAGS_BULK_URL, {'ids': [tag1.id, tag2.id]},
+                                 format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Tag.objects.exists())
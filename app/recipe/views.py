@@ -1,40 +1,139 @@
+import io
+
+from django.conf import settings
+from django.db.models import Count, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.translation import ugettext_lazy as _
+
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
+from core.authentication import CachedTokenAuthentication
 from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from core.tasks import defer
+from recipe import bulk, serializers
+from recipe.autocomplete import AUTOCOMPLETE_LIMIT, \
+    AUTOCOMPLETE_MAX_LIMIT, autocomplete
+from recipe.caching import CachedListMixin
+from recipe.listing import ValuesListMixin
+from recipe.search import search_recipes
+from recipe.stats import recipe_stats
+from recipe.export import EXPORT_FORMATS, iter_recipes
+from recipe.importing import IMPORT_FORMATS, RecipeImporter, guess_format
+from recipe.images import process_recipe_image
+from recipe.pagination import RecipeCursorPagination, \
+    RecipeAttrCursorPagination, RecipeAttrPopularCursorPagination, \
+    RecipeSearchPagination
+
 
+# Recipe fields stored as columns, which ?fields= can narrow a query to
+RECIPE_COLUMNS = {'title', 'time_minutes', 'price', 'link', 'image',
+                  'image_status'}
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+
+class BaseRecipeAttrViewSet(CachedListMixin,
+                            ValuesListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewset for user owner recipe attributes"""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Return Objects for the current authenticated user only"""
         assigned_only = bool(self.request.query_params.get('assigned_only'))
+        unused_only = bool(self.request.query_params.get('unused_only'))
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe_count__gt=0)
+        if unused_only:
+            queryset = queryset.filter(recipe_count=0)
+
+        queryset = queryset.filter(user=self.request.user)
+        if self._sort() == 'popular':
+            return queryset.order_by('-recipe_count', '-id')
+        return queryset.order_by('-name')
+
+    def _sort(self):
+        """Return the list order asked for with ?sort="""
+        sort = self.request.query_params.get('sort', 'name')
+        if sort not in ('name', 'popular'):
+            msg = _('Expected one of "name" or "popular".')
+            raise ValidationError({'sort': msg})
+        return sort
 
-        return queryset.filter(user=self.request.user).order_by('-name')
+    @property
+    def paginator(self):
+        """Page by usage instead of name when sorting by popularity"""
+        if not hasattr(self, '_paginator') and self._sort() == 'popular':
+            self._paginator = RecipeAttrPopularCursorPagination()
+        return super().paginator
 
     def perform_create(self, serializer):
         """Create a new attribute"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """Return the most used names starting with ?q="""
+        limit = request.query_params.get('limit', AUTOCOMPLETE_LIMIT)
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= AUTOCOMPLETE_MAX_LIMIT:
+            msg = _('Expected a number from 1 to {max}.').format(
+                max=AUTOCOMPLETE_MAX_LIMIT
+            )
+            raise ValidationError({'limit': msg})
+
+        return Response(autocomplete(
+            self.queryset.model, request.user.id,
+            request.query_params.get('q', ''), limit
+        ))
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        """Create, rename or delete a batch of attributes"""
+        queryset = self.queryset.filter(user=request.user)
+        if request.method == 'DELETE':
+            bulk.delete_batch(request.user, queryset, request.data)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        partial = request.method == 'PATCH'
+        validated, errors = bulk.validate_batch(
+            self.bulk_serializer_class, request.data,
+            self.get_serializer_context(), partial=partial
+        )
+        if partial:
+            objects = bulk.check_owned(queryset, validated, errors)
+            bulk.raise_for_errors(errors)
+            attrs = bulk.update_attrs(request.user, objects, validated)
+        else:
+            bulk.raise_for_errors(errors)
+            attrs = bulk.create_attrs(
+                queryset.model, request.user, validated
+            )
+
+        serializer = self.get_serializer(attrs, many=True)
+        return Response(
+            serializer.data,
+            status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+        )
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage Tags in the Database"""
 
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    bulk_serializer_class = serializers.TagBulkSerializer
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -42,36 +141,137 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    bulk_serializer_class = serializers.IngredientBulkSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedListMixin, ValuesListMixin,
+                    viewsets.ModelViewSet):
     """Manage Recipes in the Database"""
 
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
+
+    def _params_to_ints(self, qs, param):
+        """Convert a list of string IDs to a list of unique integers"""
+        try:
+            return sorted({int(str_id) for str_id in qs.split(',')})
+        except ValueError:
+            msg = _('Expected a comma separated list of IDs.')
+            raise ValidationError({param: msg})
+
+    def _filter_related(self, queryset, field, ids, match):
+        """Filter recipes linked to any or all of ids through field"""
+        m2m = Recipe._meta.get_field(field)
+        target = f'{m2m.m2m_reverse_field_name()}_id'
+        links = m2m.remote_field.through.objects.filter(
+            **{f'{target}__in': ids}
+        )
+        if match == 'all':
+            links = links.values('recipe_id').annotate(
+                matched=Count(target)
+            ).filter(matched=len(ids))
+
+        return queryset.filter(id__in=links.values('recipe_id'))
+
+    def _requested_names(self, param, allowed):
+        """Return the set of names listed in a query parameter, or None"""
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = names - set(allowed)
+        if unknown:
+            msg = _('Unknown fields: {}.').format(', '.join(sorted(unknown)))
+            raise ValidationError({param: msg})
+        return names
+
+    def _sparse_fields(self):
+        """Return the fields and expansions requested for a read
 
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+        fields is None when every field should be returned.
+        """
+        if not hasattr(self, '_sparse'):
+            fields, expand = None, set()
+            if self.action in ('list', 'retrieve'):
+                serializer_class = self.get_serializer_class()
+                fields = self._requested_names(
+                    'fields', serializer_class.Meta.fields
+                )
+                expand = self._requested_names(
+                    'expand', serializer_class.expandable
+                ) or set()
+            self._sparse = (fields, expand)
+        return self._sparse
 
     def get_queryset(self):
         """Return Objects for the current authenticated user only"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            msg = _('Expected one of "any" or "all".')
+            raise ValidationError({'match': msg})
 
         queryset = self.queryset
 
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints(tags, 'tags')
+            queryset = self._filter_related(queryset, 'tags', tag_ids, match)
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = self._params_to_ints(ingredients, 'ingredients')
+            queryset = self._filter_related(
+                queryset, 'ingredients', ingredient_ids, match
+            )
+
+        queryset = self._prefetch_related(
+            queryset.filter(user=self.request.user)
+        )
+        fields = self._sparse_fields()[0]
+        if fields is not None:
+            # Load only the columns being returned
+            queryset = queryset.only(
+                'id', *(fields & RECIPE_COLUMNS)
+            )
+
+        search = self.request.query_params.get('search')
+        if search and self.action == 'list':
+            return search_recipes(queryset, search)
+        return queryset.order_by('-id')
+
+    @property
+    def paginator(self):
+        """Page search results by number, since they are ranked"""
+        if (not hasattr(self, '_paginator') and
+                self.request.query_params.get('search')):
+            self._paginator = RecipeSearchPagination()
+        return super().paginator
 
-        return queryset.filter(user=self.request.user)
+    def _prefetch_related(self, queryset):
+        """Prefetch the relations the current action serializes"""
+        fields, expand = self._sparse_fields()
+        if self.action == 'retrieve':
+            # Details always nest tags and ingredients
+            expand = {'tags', 'ingredients'}
+        elif self.action not in ('list', 'bulk'):
+            return queryset
+
+        for name, model in (('tags', Tag), ('ingredients', Ingredient)):
+            if fields is not None and name not in fields:
+                continue
+            related = model.objects.order_by('id')
+            if name not in expand:
+                related = related.only('id')
+            queryset = queryset.prefetch_related(
+                Prefetch(name, queryset=related)
+            )
+        if self.action == 'retrieve' and \
+                (fields is None or 'renditions' in fields):
+            queryset = queryset.prefetch_related('renditions')
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -81,10 +281,93 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeImageSerializer
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        """Return the serializer, limited to any requested fields"""
+        fields, expand = self._sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        if expand:
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        """Create, update or delete a batch of recipes"""
+        queryset = self.queryset.filter(user=request.user)
+        if request.method == 'DELETE':
+            bulk.delete_batch(request.user, queryset, request.data)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        partial = request.method == 'PATCH'
+        validated, errors = bulk.validate_batch(
+            serializers.RecipeBulkSerializer, request.data,
+            self.get_serializer_context(), partial=partial
+        )
+        bulk.check_related(request.user, validated, errors)
+        if partial:
+            objects = bulk.check_owned(queryset, validated, errors)
+            bulk.raise_for_errors(errors)
+            recipes = bulk.update_recipes(request.user, objects, validated)
+        else:
+            bulk.raise_for_errors(errors)
+            recipes = bulk.create_recipes(request.user, validated)
+
+        position = {recipe.id: i for i, recipe in enumerate(recipes)}
+        recipes = self._prefetch_related(queryset.filter(id__in=position))
+        recipes = sorted(recipes, key=lambda recipe: position[recipe.id])
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(
+            serializer.data,
+            status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+        )
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """Stream the user's recipes as NDJSON or CSV"""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            msg = _('Expected one of "ndjson" or "csv".')
+            raise ValidationError({'output': msg})
+
+        stream, content_type = EXPORT_FORMATS[output]
+        recipes = iter_recipes(self.get_queryset(),
+                               settings.EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(stream(recipes),
+                                         content_type=content_type)
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{output}"'
+        return response
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """Return summary statistics of the user's recipes"""
+        return Response(recipe_stats(request.user.id))
+
+    @action(methods=['POST'], detail=False, url_path='import')
+    def import_recipes(self, request):
+        """Import recipes from an uploaded NDJSON or CSV file"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': _('No file was submitted.')})
+        fmt = request.data.get('input') or guess_format(upload.name)
+        if fmt not in IMPORT_FORMATS:
+            msg = _('Expected one of "ndjson" or "csv".')
+            raise ValidationError({'input': msg})
+
+        importer = RecipeImporter(request.user,
+                                  batch_size=settings.IMPORT_BATCH_SIZE)
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        try:
+            stats = importer.run(fmt, lines)
+        except UnicodeDecodeError:
+            raise ValidationError({'file': _('File must be UTF-8 text.')})
+
+        return Response(stats.as_dict(), status=status.HTTP_201_CREATED)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe"""
@@ -95,7 +378,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
             data=request.data
         )
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save(image_status=Recipe.IMAGE_PENDING)
+            defer(process_recipe_image, recipe.id, recipe.image.name)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TOKEN_URL = reverse('user:token')
+
+LOGIN_RATES = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={
+    'login_ip': '4/min',
+    'login_email': '2/min',
+})
+
+
+class LoginTests(TestCase):
+    """Test password upgrades and throttling on login"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+
+    def _login(self, email='test@test.com', password='testpass', **extra):
+        return self.client.post(TOKEN_URL, {
+            'email': email, 'password': password
+        }, **extra)
+
+    def test_new_passwords_use_policy_hasher(self):
+        """Test new passwords are hashed with Argon2 by default"""
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+    def test_login_upgrades_old_hash(self):
+        """Test a successful login rehashes a password from an old hasher"""
+        self.user.password = make_password('testpass', hasher='pbkdf2_sha1')
+        self.user.save()
+
+        res = self._login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+    def test_failed_login_keeps_old_hash(self):
+        """Test a wrong password leaves the stored hash alone"""
+        self.user.password = make_password('testpass', hasher='pbkdf2_sha1')
+        self.user.save()
+
+        self._login(password='wrong')
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha1$'))
+
+    @override_settings(ARGON2_TIME_COST=3)
+    def test_login_applies_new_costs(self):
+        """Test changing the Argon2 costs rehashes on the next login"""
+        self._login()
+
+        self.user.refresh_from_db()
+        self.assertIn('t=3', self.user.password)
+
+    @override_settings(
+        PASSWORD_HASHERS=settings.PASSWORD_HASHER_POLICIES['pbkdf2'],
+        PBKDF2_ITERATIONS=1000
+    )
+    def test_pbkdf2_policy(self):
+        """Test switching policy moves passwords over as users log in"""
+        self._login()
+
+        self.user.refresh_from_db()
+        self.assertTrue(
+            self.user.password.startswith('pbkdf2_sha256$1000$')
+        )
+
+    @override_settings(REST_FRAMEWORK=LOGIN_RATES)
+    def test_throttle_per_email(self):
+        """Test attempts on one email are limited from any address"""
+        for address in ('10.0.0.1', '10.0.0.2'):
+            res = self._login(password='wrong', REMOTE_ADDR=address)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self._login(REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self._login(email='other@test.com', REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(REST_FRAMEWORK=LOGIN_RATES)
+    def test_throttle_per_address(self):
+        """Test attempts from one address are limited across emails"""
+        for i in range(4):
+            res = self._login(email=f'user{i}@test.com')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self._login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+    @override_settings(REST_FRAMEWORK=LOGIN_RATES)
+    def test_throttle_ignores_forwarded_for(self):
+        """Test a client cannot pick a new address for each attempt"""
+        for i in range(4):
+            self._login(email=f'user{i}@test.com',
+                        HTTP_X_FORWARDED_FOR=f'10.0.1.{i}')
+
+        res = self._login(HTTP_X_FORWARDED_FOR='10.0.1.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=dict(LOGIN_RATES, NUM_PROXIES=1))
+    def test_throttle_behind_proxy(self):
+        """Test the address a proxy appends is throttled on its own"""
+        for i in range(4):
+            self._login(email=f'user{i}@test.com',
+                        HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.1.1')
+
+        res = self._login(HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.1.1')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        res = self._login(HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.1.2')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
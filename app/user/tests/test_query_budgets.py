@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.testing import QueryBudgetMixin
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+MANAGE_USER_URL = reverse('user:manage')
+
+# Most queries each endpoint may run, whatever the number of users
+BUDGETS = {
+    'user-create': 2,
+    'user-token': 5,
+    'user-retrieve': 0,
+    'user-update': 2,
+}
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test user endpoints run a fixed number of queries"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = 0
+
+    def _seed(self, size):
+        """Add size users, returning a client logged in as the last one"""
+        users = []
+        for _ in range(size):
+            self.users += 1
+            users.append(get_user_model().objects.create_user(
+                f'user{self.users}@test.com'
+            ))
+        users[-1].set_password('testpass')
+        users[-1].save()
+        client = APIClient()
+        client.force_authenticate(users[-1])
+        client.user = users[-1]
+        return client
+
+    def test_create(self):
+        """Test signing up does not depend on the number of users"""
+        def seed(size):
+            self._seed(size)
+            return f'new{self.users}@test.com'
+
+        self.assertQueryBudget(
+            BUDGETS['user-create'], seed,
+            lambda email: APIClient().post(CREATE_USER_URL, {
+                'email': email, 'password': 'testpass', 'name': 'Test'
+            })
+        )
+
+    def test_token(self):
+        """Test logging in does not depend on the number of users"""
+        self.assertQueryBudget(
+            BUDGETS['user-token'], self._seed,
+            lambda client: APIClient().post(TOKEN_URL, {
+                'email': client.user.email, 'password': 'testpass'
+            })
+        )
+
+    def test_retrieve(self):
+        """Test reading the profile needs no queries beyond auth"""
+        self.assertQueryBudget(
+            BUDGETS['user-retrieve'], self._seed,
+            lambda client: client.get(MANAGE_USER_URL)
+        )
+
+    def test_update(self):
+        """Test updating the profile runs a fixed number of queries"""
+        self.assertQueryBudget(
+            BUDGETS['user-update'], self._seed,
+            lambda client: client.patch(MANAGE_USER_URL, {'name': 'New'})
+        )
@@ -1,8 +1,11 @@
 from .serializers import UserSerializer, AuthTokenSerializer
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
+from user.throttling import LoginIPRateThrottle, LoginEmailRateThrottle
+
 
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
@@ -15,13 +18,14 @@ class CreateTokenView(ObtainAuthToken):
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginIPRateThrottle, LoginEmailRateThrottle)
 
 
 class ManagerUserView(generics.RetrieveUpdateAPIView):
     """Manager Autheticated Users"""
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):